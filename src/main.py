@@ -7,66 +7,131 @@ import bz2
 import asyncio
 import logging
 import importlib
-import xml.sax
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 import aiohttp
-from transformers import fetch_mappings, WikiDumpHandler, WikivoyageParser
+try:
+    import uvloop
+except ImportError:
+    # uvloop is not available on Windows, fall back to the default event loop there
+    uvloop = None
+from transformers import fetch_mappings, download_decompressed, WikiDumpHandler, WikivoyageParser
+from output_handlers import MultiHandler
 
 
 logger = logging.getLogger(__name__)
 
-def gather_handler_kwargs(handler_name: str) -> dict:
+# amount of compressed dump data handed to the decompressor at once
+DECOMPRESS_BATCH_SIZE = 8 * 1024 * 1024
+
+def _cast_env_value(val: str) -> int | bool | str:
+    """
+    Cast ints and bools, leave everything else as is.
+    """
+    try:
+        return int(val)
+    except ValueError:
+        pass
+    low = val.lower()
+    if low == "true":
+        return True
+    if low == "false":
+        return False
+    return val
+
+
+_BOOL_VALUES = {"true": True, "1": True, "yes": True, "false": False, "0": False, "no": False}
+
+
+def _cast_bool(val: str) -> bool:
+    """
+    Strict bool cast, so a typo cannot silently turn an option off.
+    """
+    try:
+        return _BOOL_VALUES[val.strip().lower()]
+    except KeyError:
+        raise ValueError(f"invalid boolean {val!r}") from None
+
+
+# casts for the types a handler can declare in its ENV_SCHEMA
+_CASTERS = {
+    str: str,
+    int: int,
+    float: float,
+    bool: _cast_bool,
+}
+
+
+def gather_handler_kwargs(
+    handler_name: str, environ: dict[str, str] | None = None, schema: dict[str, type] | None = None,
+) -> dict:
     """
     Find all ENV vars starting with HANDLER_<NAME>_ and turn them into kwargs.
     E.g. HANDLER_SFTP_HOST=foo → {"host": "foo"}, HANDLER_SFTP_PORT=2222 → {"port": 2222}
+    Options declared in the handler's schema are cast to their declared type (so "0755" stays a string if declared as one),
+    anything else falls back to guessing ints and bools.
+    A snapshot of the environment can be passed to avoid re-reading os.environ for every handler.
     """
     prefix = f"HANDLER_{handler_name.upper()}_"
-    kwargs = {}
+    prefix_len = len(prefix)
+    if environ is None:
+        environ = os.environ
+    if schema is None:
+        schema = {}
 
-    for env_key, val in os.environ.items():
+    kwargs = {}
+    for env_key, val in environ.items():
         if not env_key.startswith(prefix):
             continue
-        param = env_key.replace(prefix, "").lower()
-        # cast ints
-        if val.isdigit():
-            val = int(val)
-        # cast bools
-        elif val.lower() in ("true", "false"):
-            val = val.lower() == "true"
-        kwargs[param] = val
+        name = env_key[prefix_len:].lower()
+        typ = schema.get(name)
+        if typ is None:
+            kwargs[name] = _cast_env_value(val)
+            continue
+        try:
+            kwargs[name] = _CASTERS[typ](val)
+        except ValueError:
+            expected = "one of true/false/1/0/yes/no" if typ is bool else f"of type {typ.__name__}"
+            raise ValueError(f"{env_key} must be {expected}, got {val!r}") from None
     logger.debug(f"Handler kwargs: {kwargs}")
     return kwargs
 
 
 async def process_dump(
-    mappings: dict[str, str], handlers
+    mappings: dict[int, str], handler, session: aiohttp.ClientSession, max_concurrent: int = 0,
+    executor: Executor | None = None,
 ):
     """
-    Stream-download the bzip2-compressed XML dump and feed to SAX.
+    Stream-download the bzip2-compressed XML dump and feed it to the dump handler.
+    max_concurrent pages (or a default number if 0) are processed at the same time, the download is paused while they are busy.
+    The pages are parsed in the executor if one is given, otherwise on the event loop.
     """
     xml_url = (
         "https://dumps.wikimedia.org/"
         "enwikivoyage/latest/"
         "enwikivoyage-latest-pages-articles.xml.bz2"
     )
-    decomp = bz2.BZ2Decompressor()
-    sax_parser = xml.sax.make_parser()
-    dump_handler = WikiDumpHandler(mappings, handlers)
-    sax_parser.setContentHandler(dump_handler)
-    timeout = aiohttp.ClientTimeout(total = 5000)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        async with session.get(xml_url) as resp:
-            resp.raise_for_status()
-            async for chunk in resp.content.iter_chunked(1024 * 1024):
-                data = decomp.decompress(chunk)
-                if not data:
-                    continue
-                text = data.decode("utf-8", errors="ignore")
-                sax_parser.feed(text)
-    sax_parser.close()
-    if dump_handler.tasks:
-        await asyncio.gather(*dump_handler.tasks)
+    dump_handler = WikiDumpHandler(mappings, handler, max_concurrent, executor)
+
+    # bz2 decompression is CPU-heavy and releases the GIL, so the next batch is decompressed
+    # in a worker thread while the previous one is parsed on the event loop
+    queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=2)
+    # the default timeout only limits stalls, a stalled download is resumed
+    producer = asyncio.create_task(download_decompressed(
+        session, xml_url, bz2.BZ2Decompressor().decompress, queue, DECOMPRESS_BATCH_SIZE
+    ))
+    try:
+        while (data := await queue.get()) is not None:
+            # libxml2 decodes the raw bytes itself, no need for an intermediate str
+            # waits while the page workers are busy, which in turn holds back the download
+            await dump_handler.feed(data)
+        # raises if the download failed
+        await producer
+    finally:
+        producer.cancel()
+    await dump_handler.close()
 
 async def main():
     # 1. Which handler(s) to load?
@@ -84,7 +149,28 @@ async def main():
     if max_conc < 0:
         raise ValueError("MAX_CONCURRENT must be >= 0")
 
+    # Parsing the wikitext is CPU-bound, spread it over worker processes
+    try:
+        parse_processes = int(os.getenv("PARSE_PROCESSES", os.cpu_count() or 1))
+    except ValueError:
+        raise ValueError("PARSE_PROCESSES must be an integer")
+
+    if parse_processes < 0:
+        raise ValueError("PARSE_PROCESSES must be >= 0")
+
     handlers = []
+    environ = dict(os.environ)
+
+    # One HTTP session for the dump downloads and all HTTP based handlers,
+    # so connections (and their TLS handshakes) are kept alive and reused for the whole run
+    session = aiohttp.ClientSession(
+        connector = aiohttp.TCPConnector(
+            limit = 200,
+            limit_per_host = 64,
+            ttl_dns_cache = 300,
+            keepalive_timeout = 75,
+        )
+    )
 
     # 3. Load each handler
     for handler_name in handler_names:
@@ -102,18 +188,19 @@ async def main():
 
         # Find the class: e.g. "sftp" → "SftpHandler"
         class_name = handler_name.title().replace("_", "") + "Handler"
-        if not hasattr(mod, class_name):
+        HandlerCls = getattr(mod, class_name, None)
+        if HandlerCls is None:
             logger.error(f"{module_path} defines no class {class_name}")
             sys.exit(1)
-        HandlerCls = getattr(mod, class_name)
 
         logger.info(f"Using handler from {module_path}")
 
         # Build kwargs from ENV
-        handler_kwargs = gather_handler_kwargs(handler_name)
+        handler_kwargs = gather_handler_kwargs(handler_name, environ, getattr(HandlerCls, "ENV_SCHEMA", None))
 
-        # Add max_concurrent to kwargs
+        # Add max_concurrent and the shared session to kwargs
         handler_kwargs["max_concurrent"] = max_conc
+        handler_kwargs["session"] = session
 
         # Instantiate
         handler = await HandlerCls.create(**handler_kwargs)
@@ -121,15 +208,27 @@ async def main():
 
     # 4. Fetch mappings
     logger.info("Fetching mappings from SQL dump…")
-    mappings = await fetch_mappings()
+    mappings = await fetch_mappings(session)
     logger.info(f"Got {len(mappings)} wikibase_item mappings.")
 
     # 5. Stream & split the XML dump
     logger.info("Processing XML dump…")
-    await process_dump(mappings, handlers)  # Pass 0 as max_concurrent since handlers handle it
+    # every entry is written to all handlers concurrently
+    multi_handler = MultiHandler(handlers)
+    # spawn instead of fork, the process already runs threads (executor, event loop) by now
+    pool = ProcessPoolExecutor(
+        max_workers = parse_processes,
+        mp_context = multiprocessing.get_context("spawn"),
+    ) if parse_processes else None
+    try:
+        await process_dump(mappings, multi_handler, session, max_conc, pool)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
 
     # 6. Finish up
-    await asyncio.gather(*[handler.close() for handler in handlers])
+    await multi_handler.close()
+    await session.close()
     logger.info("All done.")
 
 
@@ -140,4 +239,4 @@ if __name__ == "__main__":
     else:
         logging.basicConfig(level=logging.INFO)
 
-    asyncio.run(main())
+    asyncio.run(main(), loop_factory=uvloop.new_event_loop if uvloop else None)
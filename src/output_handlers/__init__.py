@@ -1,3 +1,4 @@
 from .base_handler import BaseHandler
 from .filesystem import FilesystemHandler
-from .bunny_storage import BunnyStorageHandler
\ No newline at end of file
+from .bunny_storage import BunnyStorageHandler
+from .multi_handler import MultiHandler
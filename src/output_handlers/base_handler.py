@@ -1,7 +1,10 @@
 """Reference handler for output handlers."""
 from abc import ABC, abstractmethod
+from itertools import repeat
+import inspect
 import logging
 import asyncio
+import aiohttp
 
 
 
@@ -12,14 +15,30 @@ class BaseHandler(ABC):
     """
 
     logger = logging.getLogger(__name__)
-    _successful_writes = 0
-    _failed_writes = 0
+    _successful_writes: int
+    _failed_writes: int
     fail_on_error: bool
     semaphore: asyncio.Semaphore = None
+    session: aiohttp.ClientSession | None = None
+    # types of the options read from HANDLER_<NAME>_<OPTION>, subclasses extend it with their own
+    ENV_SCHEMA: dict[str, type] = {"fail_on_error": bool}
+
+    def __init__(self):
+        # per instance, so handlers never share (or lazily shadow) class-level counters
+        self._successful_writes = 0
+        self._failed_writes = 0
+
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # handlers implementing the original `_write_entry(entry, uid)` keep working, they just get no payload
+        params = inspect.signature(cls._write_entry).parameters.values()
+        cls._accepts_payload = any(p.name == "payload" or p.kind is p.VAR_KEYWORD for p in params)
+
 
     @classmethod
     @abstractmethod
-    async def create(cls, fail_on_error: bool = True, max_concurrent=0, **kwargs) -> "BaseHandler":
+    async def create(cls, fail_on_error: bool = True, max_concurrent=0, session: aiohttp.ClientSession | None = None, **kwargs) -> "BaseHandler":
         """
         Initializes the BaseHandler with optional parameters.
 
@@ -27,10 +46,13 @@ class BaseHandler(ABC):
             fail_on_error (bool): If True, the handler will raise an exception on error. Defaults to True.
             max_concurrent: Maximum number of concurrent write operations.
                             0 means unlimited concurrency.
+            session (aiohttp.ClientSession): Shared HTTP session for handlers talking to HTTP APIs.
+                            It is owned by the caller and must not be closed by the handler.
             **kwargs: Additional keyword arguments for specific handler implementations.
         """
         obj = cls(**kwargs)
         obj.fail_on_error = fail_on_error
+        obj.session = session
         if max_concurrent > 0:
             obj.semaphore = asyncio.Semaphore(max_concurrent)
         obj.logger.info(f"Handler initialized with fail_on_error={obj.fail_on_error}, max_concurrent={max_concurrent}")
@@ -38,42 +60,61 @@ class BaseHandler(ABC):
 
 
     @abstractmethod
-    async def _write_entry(self, entry: dict, uid: str) -> bool:
+    async def _write_entry(self, entry: dict, uid: str, payload: bytes | None = None) -> bool:
         """
         Asynchronously writes a single entry to the output. This method should gracefully handle any exceptions that may occur during the writing process and simply return False if an error occurs.
 
         Args:
             entry (dict): The entry to write (will be JSON-encoded).
             uid (str): The unique identifier for the entry. The default id provided by wikivoyage is recommended.
+            payload (bytes): The entry already encoded as JSON, if available. Handlers writing JSON should use it instead of encoding the entry again.
+                             Optional, handlers whose `_write_entry` has no `payload` parameter are called with the entry and uid only.
         Returns:
             bool: True if the entry was written successfully, False otherwise.
         """
         pass
 
 
-    async def write_entry(self, entry: dict, uid: str):
+    async def write_entry(self, entry: dict, uid: str, payload: bytes | None = None):
         """
         Public method to write an entry to the output. It handles exceptions and logs errors.
 
         Args:
             entry (dict): The entry to write (will be JSON-encoded).
             uid (str): The unique identifier for the entry. The default id provided by wikivoyage is recommended.
+            payload (bytes): Optionally, the entry already encoded as JSON, so it is not encoded once per handler.
         """
+        kwargs = {"payload": payload} if self._accepts_payload else {}
         if self.semaphore:
             async with self.semaphore:
-                success = await self._write_entry(entry, uid)
+                success = await self._write_entry(entry, uid, **kwargs)
         else:
-            success = await self._write_entry(entry, uid)
+            success = await self._write_entry(entry, uid, **kwargs)
         if success:
-            self.logger.debug(f"Successfully wrote entry with UID {uid}")
+            self.logger.debug("Successfully wrote entry with UID %s", uid)
             self._successful_writes += 1
         else:
-            self.logger.error(f"Failed to write entry with UID {uid}")
+            self.logger.error("Failed to write entry with UID %s", uid)
             self._failed_writes += 1
             if self.fail_on_error:
                 raise Exception(f"Failed to write entry with UID {uid}")
 
 
+    async def write_entries(self, entries: list[tuple[dict, str]], payloads: list[bytes] | None = None):
+        """
+        Public method to write a batch of entries. By default the entries are written concurrently through `write_entry`,
+        handlers with a bulk API can override this.
+
+        Args:
+            entries (list): (entry, uid) pairs, as passed to `write_entry`.
+            payloads (list): Optionally, the entries already encoded as JSON, in the same order.
+        """
+        await asyncio.gather(*[
+            self.write_entry(entry, uid, payload)
+            for (entry, uid), payload in zip(entries, payloads or repeat(None))
+        ])
+
+
     async def close(self):
         """
         Closes the handler. This method should be overridden by subclasses if they need to perform any cleanup operations.
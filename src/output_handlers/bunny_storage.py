@@ -1,13 +1,27 @@
-import json
+import asyncio
 import aiohttp
+import orjson
+from multidict import CIMultiDict
 from .base_handler import BaseHandler
 
+# number of upload workers when no max_concurrent is configured (matches the per-host limit of the shared session)
+DEFAULT_WORKERS = 64
+# headers aiohttp would otherwise generate for every upload
+SKIP_AUTO_HEADERS = ("User-Agent", "Content-Type")
+
 class BunnyStorageHandler(BaseHandler):
 
     base_url: str
-    headers: dict
-    _session: aiohttp.ClientSession
-    _connector: aiohttp.TCPConnector
+    headers: CIMultiDict
+    _url_prefix: str
+    _connector: aiohttp.TCPConnector | None = None
+    _queue: asyncio.Queue
+    _workers: list[asyncio.Task]
+    _worker_error: Exception | None = None
+    ENV_SCHEMA = {
+        **BaseHandler.ENV_SCHEMA,
+        "region": str, "base_path": str, "api_key": str, "keepalive_timeout": int,
+    }
 
     @classmethod
     async def create(
@@ -16,31 +30,78 @@ class BunnyStorageHandler(BaseHandler):
         base_path: str,
         api_key: str,
         keepalive_timeout: int = 75,
+        max_concurrent: int = 0,
         **kwargs,
     ) -> "BunnyStorageHandler":
-        obj = await super().create(**kwargs)
+        obj = await super().create(max_concurrent=max_concurrent, **kwargs)
         obj.base_url = f"https://{region}.bunnycdn.com/{base_path}"
-        obj.headers = {
+        obj._url_prefix = f"{obj.base_url}/"
+        # built once in the case-insensitive form aiohttp uses internally
+        obj.headers = CIMultiDict({
             "AccessKey": api_key,
             "Content-Type": "application/json",
             "accept": "application/json",
-        }
-
-        # setup the aiohttp session and connector
-        obj._connector = aiohttp.TCPConnector(
-            # limit is implicitly set to 100
-            keepalive_timeout = keepalive_timeout,
-        )
-        obj._session = aiohttp.ClientSession(connector=obj._connector)
+        })
+
+        # reuse the shared session if one was passed, otherwise setup our own session and connector
+        if obj.session is None:
+            obj._connector = aiohttp.TCPConnector(
+                # limit is implicitly set to 100
+                keepalive_timeout = keepalive_timeout,
+            )
+            obj.session = aiohttp.ClientSession(connector=obj._connector)
+
+        # uploads are drained from a bounded queue by a fixed pool of workers,
+        # each keeping its own PUT in flight. The worker count already bounds
+        # the concurrency, so the semaphore of the base class is not needed.
+        num_workers = max_concurrent or DEFAULT_WORKERS
+        obj.semaphore = None
+        obj._queue = asyncio.Queue(maxsize=num_workers * 2)
+        obj._workers = [asyncio.create_task(obj._worker()) for _ in range(num_workers)]
         return obj
 
 
-    async def _write_entry(self, entry: dict, uid: str) -> bool:
-        payload = json.dumps(entry).encode("utf-8")
-        url = f"{self.base_url}/{uid}.json"
+    async def write_entry(self, entry: dict, uid: str, payload: bytes | None = None):
+        """
+        Enqueues the entry for upload. Returns as soon as a slot in the queue is free,
+        the actual upload is performed by one of the workers.
+        """
+        if self._worker_error:
+            raise self._worker_error
+        await self._queue.put((entry, uid, payload))
+
+
+    async def _worker(self):
+        """
+        Drains the upload queue until a sentinel (None) is received.
+        """
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                break
+            entry, uid, payload = item
+            try:
+                await super().write_entry(entry, uid, payload)
+            except Exception as e:
+                # keep draining so producers never block on a full queue,
+                # the error is re-raised on the next write_entry or on close
+                if self._worker_error is None:
+                    self._worker_error = e
+
+
+    async def _write_entry(self, entry: dict, uid: str, payload: bytes | None = None) -> bool:
+        if payload is None:
+            payload = orjson.dumps(entry)
+        url = self._url_prefix + uid + ".json"
 
         try:
-            async with self._session.put(url, data=payload, headers=self.headers) as resp:
+            async with self.session.put(
+                url,
+                data=payload,
+                headers=self.headers,
+                # the content type is already set and the user agent is irrelevant to the storage API
+                skip_auto_headers=SKIP_AUTO_HEADERS,
+            ) as resp:
                 if resp.status in (200, 201, 204):
                     return True
                 body = await resp.text()
@@ -53,6 +114,15 @@ class BunnyStorageHandler(BaseHandler):
 
 
     async def close(self):
-        await self._session.close()
-        await self._connector.close()
+        # one sentinel per worker, queued after all pending entries
+        for _ in self._workers:
+            await self._queue.put(None)
+        await asyncio.gather(*self._workers)
+
+        # only close what we created ourselves
+        if self._connector is not None:
+            await self.session.close()
+            await self._connector.close()
         await super().close()
+        if self._worker_error:
+            raise self._worker_error
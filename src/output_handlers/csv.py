@@ -1,17 +1,52 @@
 """CSV output handler for writing entries to a single CSV file with ID and title."""
 from pathlib import Path
-import aiofiles
+import asyncio
+import os
 from .base_handler import BaseHandler
 
+# maximum number of rows written with a single writev call
+FLUSH_ROWS = 512
+# writev rejects more buffers than this (EINVAL)
+DEFAULT_IOV_MAX = 1024
+
+
+def _iov_max() -> int:
+    """The platform's writev buffer limit, or DEFAULT_IOV_MAX if it has none (sysconf returns -1) or cannot tell."""
+    try:
+        limit = os.sysconf("SC_IOV_MAX")
+    except (AttributeError, ValueError, OSError):
+        return DEFAULT_IOV_MAX
+    return limit if limit > 0 else DEFAULT_IOV_MAX
+
+
+IOV_MAX = _iov_max()
+
+
+def _writev_all(fd: int, buffers: list[bytes]):
+    """Blocking vectored write of all buffers, in slices of at most IOV_MAX and retrying on short writes."""
+    for start in range(0, len(buffers), IOV_MAX):
+        chunk = buffers[start:start + IOV_MAX]
+        written = os.writev(fd, chunk)
+        if written < sum(map(len, chunk)):
+            remaining = memoryview(b"".join(chunk))[written:]
+            while remaining:
+                remaining = remaining[os.write(fd, remaining):]
+
 
 class CsvHandler(BaseHandler):
     """
     Handler for writing entries to a single CSV file.
     This handler extracts only the ID and title (from properties.title)
     rather than writing the entire JSON document.
+    Rows are collected while a write is running and written in batches of up to `FLUSH_ROWS` with a single `os.writev` call.
+    Each entry only reports success once its row is on disk, so a failed write fails all rows of its batch.
     """
 
-    file_writer: object # I believe aiofiles doesn't expose a type for this
+    _fd: int
+    _pending: list[tuple[bytes, asyncio.Future]]
+    # a single writer keeps the batches in order and from interleaving
+    _writer: asyncio.Task | None
+    ENV_SCHEMA = {**BaseHandler.ENV_SCHEMA, "output_path": str}
 
     @classmethod
     async def create(
@@ -32,24 +67,26 @@ class CsvHandler(BaseHandler):
         # Create the containing directory if it doesn't exist
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Create file with header if it doesn't exist
-        if not output_path.exists():
-            async with aiofiles.open(output_path, mode='w', encoding='utf-8') as file:
-                await file.write('"id","title"\n')
-
         # open the file and keep it open for appending
-        obj.file_writer = await aiofiles.open(output_path, mode='a', encoding='utf-8')
+        obj._fd = os.open(output_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        obj._pending = []
+        obj._writer = None
+
+        # Write the header if the file is new
+        if os.fstat(obj._fd).st_size == 0:
+            _writev_all(obj._fd, [b'"id","title"\n'])
 
         return obj
 
 
-    async def _write_entry(self, entry: dict, uid: str) -> bool:
+    async def _write_entry(self, entry: dict, uid: str, payload: bytes | None = None) -> bool:
         """
         Asynchronously writes a single entry to the CSV file.
 
         Args:
             entry (dict): The entry to write.
             uid (str): The unique identifier for the entry.
+            payload (bytes): Unused, only the id and title are written.
 
         Returns:
             bool: True if the entry was written successfully, False otherwise.
@@ -61,7 +98,12 @@ class CsvHandler(BaseHandler):
             # Escape quotes in title
             title = str(title).replace('"', '""')
 
-            await self.file_writer.write(f'"{uid}","{title}"\n')
+            written = asyncio.get_running_loop().create_future()
+            self._pending.append((f'"{uid}","{title}"\n'.encode("utf-8"), written))
+            # the writer starts on the next loop iteration, rows added until then join its first batch
+            if self._writer is None:
+                self._writer = asyncio.create_task(self._write_pending())
+            await written
 
             return True
         except Exception:
@@ -69,9 +111,33 @@ class CsvHandler(BaseHandler):
             return False
 
 
+    async def _write_pending(self):
+        """
+        Writes pending rows in batches until none are left, resolving the future of every row written.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                batch = self._pending[:FLUSH_ROWS]
+                del self._pending[:FLUSH_ROWS]
+                try:
+                    await loop.run_in_executor(None, _writev_all, self._fd, [row for row, _ in batch])
+                except Exception as e:
+                    for _, written in batch:
+                        written.set_exception(e)
+                else:
+                    for _, written in batch:
+                        written.set_result(None)
+        finally:
+            # reset without yielding, so a new row can never find a writer that is about to exit
+            self._writer = None
+
+
     async def close(self):
         """
         Performs cleanup and logs statistics.
         """
-        await self.file_writer.close()
+        if self._writer is not None:
+            await self._writer
+        os.close(self._fd)
         await super().close()
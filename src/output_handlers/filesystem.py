@@ -1,22 +1,53 @@
 """Handler that writes files to the filesystem."""
 from pathlib import Path
-import aiofiles
+import asyncio
 from .base_handler import BaseHandler
-import json
+import orjson
+
+# maximum number of files written per worker-thread dispatch
+WRITE_BATCH_SIZE = 64
+# maximum number of batches being written at the same time
+MAX_WRITERS = 8
+
+
+def _write_files(files: list[tuple[Path, bytes]]) -> list[OSError | None]:
+    """
+    Blocking write of a batch of complete files, meant to be dispatched to a worker thread.
+    Returns the error (or None) for each file, so that one failure does not affect the rest of the batch.
+    """
+    errors = []
+    for path, data in files:
+        try:
+            with open(path, 'wb') as f:
+                f.write(data)
+            errors.append(None)
+        except OSError as e:
+            errors.append(e)
+    return errors
 
 class FilesystemHandler(BaseHandler):
     """
     Handler that writes files to the filesystem.
+    Pending writes are collected and submitted to worker threads in batches of up to `WRITE_BATCH_SIZE`,
+    which amortizes the thread hand-off over many small files.
     """
     output_dir: Path
+    shard: bool
+    _seen_shards: set[str]
+    _pending: list[tuple[Path, bytes, asyncio.Future]]
+    _writers: set[asyncio.Task]
+
+    ENV_SCHEMA = {**BaseHandler.ENV_SCHEMA, "output_dir": str, "shard": bool}
 
     @classmethod
-    async def create(cls, output_dir: str, **kwargs) -> "FilesystemHandler":
+    async def create(cls, output_dir: str, shard: bool = False, **kwargs) -> "FilesystemHandler":
         """
         Initializes the FileSystemHandler with the specified output directory.
 
         Args:
             output_dir (str): The directory where files will be written.
+            shard (bool): If True, files are spread over subdirectories named after the last two characters of the uid
+                          (e.g. `Q12345.json` is written to `45/Q12345.json`), which keeps the individual directories small.
             **kwargs: Additional keyword arguments for the BaseHandler.
         """
         obj = await super().create(**kwargs)
@@ -24,25 +55,74 @@ class FilesystemHandler(BaseHandler):
         # Ensure the target directory exists
         obj.output_dir.mkdir(parents=True, exist_ok=True)
         obj.logger.info(f"Output directory set to {obj.output_dir}")
+        obj.shard = shard
+        obj._seen_shards = set()
+        obj._pending = []
+        obj._writers = set()
         return obj
 
 
-    async def _write_entry(self, entry: dict, uid: str) -> bool:
+    async def _write_entry(self, entry: dict, uid: str, payload: bytes | None = None) -> bool:
         """
         Asynchronously writes a single entry to the filesystem.
 
         Args:
             entry (dict): The entry to write (will be JSON-encoded).
             uid (str): The unique identifier for the entry.
+            payload (bytes): The entry already encoded as JSON, if available.
 
         Returns:
             bool: True if the entry was written successfully, False otherwise.
         """
         try:
-            file_path = self.output_dir / f"{uid}.json"
-            async with aiofiles.open(file_path, 'w') as f:
-                await f.write(json.dumps(entry))
+            if self.shard:
+                shard = uid[-2:]
+                directory = self.output_dir / shard
+                # only hit the filesystem the first time a shard is used
+                if shard not in self._seen_shards:
+                    directory.mkdir(exist_ok=True)
+                    self._seen_shards.add(shard)
+            else:
+                directory = self.output_dir
+            file_path = directory / f"{uid}.json"
+            if payload is None:
+                payload = orjson.dumps(entry)
+            written = asyncio.get_running_loop().create_future()
+            self._pending.append((file_path, payload, written))
+            # start another writer if none is running or a full batch is waiting
+            if len(self._writers) < MAX_WRITERS and (not self._writers or len(self._pending) >= WRITE_BATCH_SIZE):
+                self._writers.add(asyncio.create_task(self._writer()))
+            await written
             return True
         except IOError as e:
             self.logger.error(f"Error writing entry {uid}: {e}")
             return False
+
+
+    async def _writer(self):
+        """
+        Writes pending files in batches until none are left.
+        """
+        # run_in_executor skips the context copy and partial that to_thread creates for every call
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                batch = self._pending[:WRITE_BATCH_SIZE]
+                del self._pending[:WRITE_BATCH_SIZE]
+                try:
+                    errors = await loop.run_in_executor(None, _write_files, [(path, data) for path, data, _ in batch])
+                except Exception as e:
+                    errors = [e] * len(batch)
+                for (_, _, written), error in zip(batch, errors):
+                    if error is None:
+                        written.set_result(None)
+                    else:
+                        written.set_exception(error)
+        finally:
+            # deregister without yielding, so a new entry can never find a writer that is about to exit
+            self._writers.discard(asyncio.current_task())
+
+
+    async def close(self):
+        await asyncio.gather(*self._writers)
+        await super().close()
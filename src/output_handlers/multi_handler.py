@@ -0,0 +1,50 @@
+"""Wrapper that fans entries out to several output handlers."""
+import asyncio
+import orjson
+from .base_handler import BaseHandler
+
+
+class MultiHandler:
+    """
+    Exposes a list of output handlers through the single-handler interface (`write_entry` and `close`).
+    Every entry is written to all handlers concurrently, so the latency per entry is that of the slowest handler
+    rather than the sum of all of them. Error handling is left to the individual handlers (see `fail_on_error`).
+    With several handlers, the entry is encoded to JSON once and the bytes are shared by all of them.
+    """
+
+    def __init__(self, handlers: list[BaseHandler]):
+        self.handlers = handlers
+
+
+    async def write_entry(self, entry: dict, uid: str, payload: bytes | None = None):
+        """
+        Writes the entry to all handlers concurrently.
+
+        Args:
+            entry (dict): The entry to write (will be JSON-encoded).
+            uid (str): The unique identifier for the entry.
+            payload (bytes): The entry already encoded as JSON, if available.
+        """
+        if payload is None and len(self.handlers) > 1:
+            payload = orjson.dumps(entry)
+        await asyncio.gather(*[handler.write_entry(entry, uid, payload) for handler in self.handlers])
+
+
+    async def write_entries(self, entries: list[tuple[dict, str]], payloads: list[bytes] | None = None):
+        """
+        Writes a batch of entries to all handlers concurrently.
+
+        Args:
+            entries (list): (entry, uid) pairs.
+            payloads (list): Optionally, the entries already encoded as JSON, in the same order.
+        """
+        if payloads is None and len(self.handlers) > 1:
+            payloads = [orjson.dumps(entry) for entry, _ in entries]
+        await asyncio.gather(*[handler.write_entries(entries, payloads) for handler in self.handlers])
+
+
+    async def close(self):
+        """
+        Closes all handlers.
+        """
+        await asyncio.gather(*[handler.close() for handler in self.handlers])
@@ -1,28 +1,89 @@
 """Handler that writes asynchronously."""
+import asyncio
+import threading
 from .base_handler import BaseHandler
-import json
+import orjson
+import zstandard
 from aiobotocore.session import AioSession
 from aiobotocore.client import AioBaseClient
+from aiobotocore.config import AioConfig
 from contextlib import AsyncExitStack
 
+# pooled connections when neither max_pool_connections nor max_concurrent is configured
+DEFAULT_POOL_CONNECTIONS = 128
+# size at which a batch is uploaded even if it has fewer than batch_size entries
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+# seconds a partial batch waits for more entries before it is uploaded anyway
+BATCH_LINGER = 1.0
+
+# zstd compressors of the worker threads by level, a ZstdCompressor must not be used by several threads at once
+_thread_compressors = threading.local()
+
+
+def _compress(level: int, data: bytes) -> bytes:
+    """
+    Blocking zstd compression, meant to run in a worker thread (zstandard releases the GIL).
+    """
+    compressors = getattr(_thread_compressors, "by_level", None)
+    if compressors is None:
+        compressors = _thread_compressors.by_level = {}
+    compressor = compressors.get(level)
+    if compressor is None:
+        compressor = compressors[level] = zstandard.ZstdCompressor(level=level)
+    return compressor.compress(data)
+
 class S3Handler(BaseHandler):
     """
     Handler that writes files to an S3 bucket asynchronously.
+    With batch_size > 0 entries are collected and uploaded together as NDJSON objects
+    (`batch-000000.ndjson`, ...) with one `<uid>\t<json>` line per entry, instead of one object per entry.
+    A batch is uploaded once it is full or `BATCH_LINGER` seconds after its first entry, and every entry waits for the upload of its batch,
+    so a failed upload fails all of its entries.
+    With zstd_level > 0 all objects are zstd-compressed and get a `.zst` suffix.
     """
     bucket_name: str
     client: AioBaseClient
     exit_stack: AsyncExitStack
+    batch_size: int
+    _batch: list[bytes]
+    _batch_bytes: int
+    _batch_seq: int
+    # resolved with the upload result of the batch being collected
+    _batch_done: asyncio.Future | None
+    _linger: asyncio.TimerHandle | None
+    _uploads: set[asyncio.Task]
+    zstd_level: int
+    ENV_SCHEMA = {
+        **BaseHandler.ENV_SCHEMA,
+        "url": str, "access_key": str, "secret_key": str, "bucket_name": str,
+        "max_pool_connections": int, "batch_size": int, "zstd_level": int,
+    }
 
     @classmethod
-    async def create(cls, url: str, access_key: str, secret_key: str, bucket_name: str, **kwargs) -> "S3Handler":
+    async def create(cls, url: str, access_key: str, secret_key: str, bucket_name: str, max_pool_connections: int | None = None, max_concurrent: int = 0, batch_size: int = 0, zstd_level: int = 0, **kwargs) -> "S3Handler":
         """
         Initializes the Handler with the specified S3 endpoint and bucket name.
 
         Args:
+            max_pool_connections (int): Number of keep-alive connections to the endpoint. Bounds the number of uploads in flight.
+                                        Defaults to max_concurrent, so every concurrent upload gets a pooled connection.
+            max_concurrent (int): Maximum number of concurrent uploads, passed on to the BaseHandler.
+            batch_size (int): Number of entries per uploaded NDJSON object. 0 (the default) uploads every entry as its own `<uid>.json`.
+            zstd_level (int): zstd compression level for the uploaded objects. 0 (the default) uploads uncompressed JSON.
             **kwargs: Additional keyword arguments for the BaseHandler.
         """
-        obj = await super().create(**kwargs)
+        obj = await super().create(max_concurrent=max_concurrent, **kwargs)
+        if max_pool_connections is None:
+            max_pool_connections = max_concurrent or DEFAULT_POOL_CONNECTIONS
         obj.bucket_name = bucket_name
+        obj.batch_size = batch_size
+        obj._batch = []
+        obj._batch_bytes = 0
+        obj._batch_seq = 0
+        obj._batch_done = None
+        obj._linger = None
+        obj._uploads = set()
+        obj.zstd_level = zstd_level
 
         obj.exit_stack = AsyncExitStack()
 
@@ -34,6 +95,11 @@ class S3Handler(BaseHandler):
                 aws_secret_access_key = secret_key,
                 aws_access_key_id = access_key,
                 endpoint_url = url,
+                # botocore defaults to only 10 pooled connections, which serializes the uploads
+                config = AioConfig(
+                    max_pool_connections = max_pool_connections,
+                    tcp_keepalive = True,
+                ),
             )
         )
 
@@ -49,16 +115,66 @@ class S3Handler(BaseHandler):
         await self.client.head_bucket(Bucket=self.bucket_name)
 
 
-    async def _write_entry(self, entry: dict, uid: str) -> bool:
+    async def _write_entry(self, entry: dict, uid: str, payload: bytes | None = None) -> bool:
         """
         Asynchronously writes a single entry to the bucket.
+        When batching, the entry is added to the current batch and the result is that of the batch's upload.
+        """
+        data = payload if payload is not None else orjson.dumps(entry)
+        if not self.batch_size:
+            return await self._put(f"{uid}.json", data)
+
+        if not self._batch:
+            loop = asyncio.get_running_loop()
+            self._batch_done = loop.create_future()
+            self._linger = loop.call_later(BATCH_LINGER, self._flush)
+        done = self._batch_done
+        line = b"%s\t%s\n" % (uid.encode(), data)
+        self._batch.append(line)
+        self._batch_bytes += len(line)
+        if len(self._batch) >= self.batch_size or self._batch_bytes >= MAX_BATCH_BYTES:
+            self._flush()
+        # shielded, the future is shared by all entries of the batch and must not be cancelled with one of them
+        return await asyncio.shield(done)
+
+
+    def _flush(self):
+        """
+        Starts the upload of the buffered entries as one NDJSON object.
+        """
+        if not self._batch:
+            return
+        self._linger.cancel()
+        # take the batch right away, so further writes start a new one
+        batch, self._batch, self._batch_bytes = self._batch, [], 0
+        key = f"batch-{self._batch_seq:06d}.ndjson"
+        self._batch_seq += 1
+        upload = asyncio.create_task(self._upload_batch(key, batch, self._batch_done))
+        self._uploads.add(upload)
+        upload.add_done_callback(self._uploads.discard)
+
+
+    async def _upload_batch(self, key: str, batch: list[bytes], done: asyncio.Future):
+        done.set_result(await self._put(key, b"".join(batch)))
+
+
+    async def _put(self, key: str, data: bytes) -> bool:
+        """
+        Uploads a single object, logging instead of raising errors.
         """
-        data = json.dumps(entry).encode('utf-8')
+        extra = {}
+        if self.zstd_level > 0:
+            key += ".zst"
+            extra["ContentType"] = "application/zstd"
         try:
+            if self.zstd_level > 0:
+                # up to MAX_BATCH_BYTES at a user-chosen level, which would block the event loop for a while
+                data = await asyncio.get_running_loop().run_in_executor(None, _compress, self.zstd_level, data)
             response = await self.client.put_object(
                 Bucket = self.bucket_name,
-                Key = f"{uid}.json",
-                Body = data
+                Key = key,
+                Body = data,
+                **extra
             )
 
             if response['ResponseMetadata']['HTTPStatusCode'] not in (200, 201):
@@ -66,11 +182,14 @@ class S3Handler(BaseHandler):
             return True
 
         except:
-            self.logger.exception(f"Failed to write entry {uid} to bucket {self.bucket_name}.")
+            self.logger.exception(f"Failed to write {key} to bucket {self.bucket_name}.")
             return False
 
 
     async def close(self):
+        # the entries of the last batch count the result of its upload themselves
+        self._flush()
+        await asyncio.gather(*self._uploads)
         await self.client.close()
         await self.exit_stack.__aexit__(None, None, None)
         await super().close()
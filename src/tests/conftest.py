@@ -0,0 +1,23 @@
+import asyncio
+import pytest
+
+def make_entries(n):
+    """`n` (entry, uid) pairs Q0, Q1, ... titled "Title 0", "Title 1", ..."""
+    return [({"type": "root", "properties": {"title": f"Title {i}"}, "children": []}, f"Q{i}") for i in range(n)]
+
+def run_concurrently(create, n, **kwargs):
+    """Create a handler with `await create(**kwargs)`, write `n` entries to it at once and close it."""
+    async def run():
+        handler = await create(**kwargs)
+        await asyncio.gather(*[handler.write_entry(entry, uid) for entry, uid in make_entries(n)])
+        await handler.close()
+        return handler
+    return asyncio.run(run())
+
+@pytest.fixture
+def entries():
+    return make_entries
+
+@pytest.fixture
+def write_concurrently():
+    return run_concurrently
@@ -0,0 +1,92 @@
+import asyncio
+import orjson
+import pytest
+from output_handlers import BunnyStorageHandler
+
+class StubResponse:
+    def __init__(self, status):
+        self.status = status
+
+    async def text(self):
+        return "stub body"
+
+    async def __aenter__(self):
+        # yield like a real request would
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+class StubSession:
+    """Answers every PUT with `status` and records the uploads."""
+
+    def __init__(self, status):
+        self.status = status
+        self.uploads = {}
+
+    def put(self, url, data, headers, skip_auto_headers):
+        self.uploads[url] = data
+        return StubResponse(self.status)
+
+async def create_handler(status, **kwargs):
+    session = StubSession(status)
+    handler = await BunnyStorageHandler.create(
+        region="storage", base_path="zone/path", api_key="key", session=session, max_concurrent=4, **kwargs
+    )
+    return handler, session
+
+def test_uploads(entries):
+    async def run():
+        handler, session = await create_handler(201)
+        for entry, uid in entries(20):
+            await handler.write_entry(entry, uid)
+        await handler.close()
+        return handler, session
+    handler, session = asyncio.run(run())
+    assert session.uploads == {
+        f"https://storage.bunnycdn.com/zone/path/{uid}.json": orjson.dumps(entry) for entry, uid in entries(20)
+    }
+    assert handler._successful_writes == 20
+    assert handler._failed_writes == 0
+
+def test_failed_uploads_are_counted_without_fail_on_error(entries):
+    async def run():
+        handler, _ = await create_handler(500, fail_on_error=False)
+        for entry, uid in entries(20):
+            await handler.write_entry(entry, uid)
+        await handler.close()
+        return handler
+    handler = asyncio.run(run())
+    assert handler._successful_writes == 0
+    assert handler._failed_writes == 20
+
+def test_failed_upload_raises_on_next_write(entries):
+    async def run():
+        handler, _ = await create_handler(500)
+        first, second = entries(2)
+        await handler.write_entry(*first)
+        # let a worker upload the entry
+        for _ in range(5):
+            await asyncio.sleep(0)
+        with pytest.raises(Exception, match="Q0"):
+            await handler.write_entry(*second)
+        with pytest.raises(Exception, match="Q0"):
+            await handler.close()
+        return handler
+    handler = asyncio.run(run())
+    assert all(worker.done() for worker in handler._workers)
+
+def test_close_drains_the_queue_and_raises(entries):
+    async def run():
+        handler, session = await create_handler(500)
+        # fewer entries than the queue holds, so none of the writes sees the error
+        for entry, uid in entries(8):
+            await handler.write_entry(entry, uid)
+        with pytest.raises(Exception, match="Failed to write entry"):
+            await handler.close()
+        return handler, session
+    handler, session = asyncio.run(run())
+    assert all(worker.done() for worker in handler._workers)
+    assert len(session.uploads) == 8
+    assert handler._failed_writes == 8
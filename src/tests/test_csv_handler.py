@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from output_handlers import csv as csv_module
+from output_handlers.csv import CsvHandler
+
+def test_concurrent_writes_keep_every_row(tmp_path, write_concurrently):
+    # more rows in flight than a single writev call accepts
+    path = tmp_path / "index.csv"
+    handler = write_concurrently(CsvHandler.create, 3000, output_path=path)
+    lines = path.read_text().splitlines()
+    assert lines[0] == '"id","title"'
+    assert sorted(lines[1:]) == sorted(f'"Q{i}","Title {i}"' for i in range(3000))
+    assert handler._successful_writes == 3000
+    assert handler._failed_writes == 0
+
+def test_failed_write_fails_every_row_of_the_batch(tmp_path, monkeypatch, entries):
+    path = tmp_path / "index.csv"
+    async def run():
+        handler = await CsvHandler.create(output_path=path, fail_on_error=False)
+        def broken(fd, buffers):
+            raise OSError("disk full")
+        monkeypatch.setattr(csv_module, "_writev_all", broken)
+        await asyncio.gather(*[handler.write_entry(entry, uid) for entry, uid in entries(100)])
+        await handler.close()
+        return handler
+    handler = asyncio.run(run())
+    assert handler._successful_writes == 0
+    assert handler._failed_writes == 100
+
+def test_failed_write_raises_with_fail_on_error(tmp_path, monkeypatch, entries):
+    async def run():
+        handler = await CsvHandler.create(output_path=tmp_path / "index.csv")
+        def broken(fd, buffers):
+            raise OSError("disk full")
+        monkeypatch.setattr(csv_module, "_writev_all", broken)
+        try:
+            await handler.write_entry(*entries(1)[0])
+        finally:
+            await handler.close()
+    with pytest.raises(Exception, match="Q0"):
+        asyncio.run(run())
+
+def test_header_is_written_once(tmp_path, write_concurrently):
+    path = tmp_path / "index.csv"
+    write_concurrently(CsvHandler.create, 3, output_path=path)
+    write_concurrently(CsvHandler.create, 3, output_path=path)
+    lines = path.read_text().splitlines()
+    assert lines.count('"id","title"') == 1
+    assert len(lines) == 7
+
+def test_iov_max_without_platform_limit(monkeypatch):
+    monkeypatch.setattr(csv_module.os, "sysconf", lambda name: -1)
+    assert csv_module._iov_max() == csv_module.DEFAULT_IOV_MAX
+
+def test_writes_are_split_at_iov_max(tmp_path, monkeypatch, write_concurrently):
+    monkeypatch.setattr(csv_module, "IOV_MAX", 3)
+    path = tmp_path / "index.csv"
+    write_concurrently(CsvHandler.create, 100, output_path=path)
+    assert len(path.read_text().splitlines()) == 101
@@ -0,0 +1,150 @@
+import asyncio
+import gzip
+import zlib
+import aiohttp
+import pytest
+from aiohttp import web
+from transformers import download
+
+DATA = b"".join(b"(%d,'wikibase_item','Q%d',NULL)," % (i, i) for i in range(20000))
+COMPRESSED = gzip.compress(DATA)
+
+async def serve(handler):
+    """Serve `handler` on a local port, returns the runner and the URL."""
+    app = web.Application()
+    app.router.add_get("/dump.gz", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}/dump.gz"
+
+async def download_all(url, timeout=None):
+    queue = asyncio.Queue(maxsize=2)
+    decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    chunks = []
+    async with aiohttp.ClientSession() as session:
+        producer = asyncio.create_task(
+            download.download_decompressed(session, url, decomp.decompress, queue, 4096, timeout)
+        )
+        while (data := await queue.get()) is not None:
+            chunks.append(data)
+        await producer
+    return b"".join(chunks)
+
+def test_download_decompresses_everything():
+    async def handler(request):
+        return web.Response(body=COMPRESSED)
+    async def run():
+        runner, url = await serve(handler)
+        try:
+            return await download_all(url)
+        finally:
+            await runner.cleanup()
+    assert asyncio.run(run()) == DATA
+
+def test_stalled_download_times_out_by_default(monkeypatch):
+    monkeypatch.setattr(download, "DEFAULT_TIMEOUT", aiohttp.ClientTimeout(total=None, sock_read=0.2))
+    monkeypatch.setattr(download, "MAX_RETRIES", 0)
+    async def run():
+        release = asyncio.Event()
+        async def handler(request):
+            response = web.StreamResponse()
+            response.content_length = len(COMPRESSED)
+            await response.prepare(request)
+            await response.write(COMPRESSED[:1000])
+            await release.wait()
+            return response
+        runner, url = await serve(handler)
+        try:
+            await asyncio.wait_for(download_all(url), 5)
+        finally:
+            release.set()
+            await runner.cleanup()
+    with pytest.raises(aiohttp.ServerTimeoutError):
+        asyncio.run(run())
+
+def ranged_handler(requests, etags, drop_at):
+    """
+    Serve COMPRESSED with Range and If-Range support, the file's ETag changes to the next of `etags` with every request.
+    The first response is cut off after `drop_at` bytes.
+    """
+    async def handler(request):
+        etag = etags[min(len(requests), len(etags) - 1)]
+        requests.append(request.headers.copy())
+        start = 0
+        range_header = request.headers.get("Range")
+        if range_header and request.headers.get("If-Range", etag) == etag:
+            start = int(range_header[len("bytes="):-1])
+        response = web.StreamResponse(status=206 if start else 200, headers={"ETag": etag})
+        if start:
+            response.headers["Content-Range"] = f"bytes {start}-{len(COMPRESSED) - 1}/{len(COMPRESSED)}"
+        response.content_length = len(COMPRESSED) - start
+        await response.prepare(request)
+        if len(requests) == 1:
+            await response.write(COMPRESSED[:drop_at])
+            await asyncio.sleep(0.05)
+            request.transport.close()
+            return response
+        await response.write(COMPRESSED[start:])
+        return response
+    return handler
+
+def test_dropped_download_is_resumed(monkeypatch):
+    monkeypatch.setattr(download, "_backoff", lambda attempt: 0)
+    requests = []
+    drop_at = len(COMPRESSED) // 2
+    async def run():
+        runner, url = await serve(ranged_handler(requests, ['"v1"'], drop_at))
+        try:
+            return await download_all(url)
+        finally:
+            await runner.cleanup()
+    assert asyncio.run(run()) == DATA
+    assert len(requests) == 2
+    assert "Range" not in requests[0]
+    assert requests[1]["Range"] == f"bytes={drop_at}-"
+    assert requests[1]["If-Range"] == '"v1"'
+
+def test_resume_fails_if_the_file_changed(monkeypatch):
+    monkeypatch.setattr(download, "_backoff", lambda attempt: 0)
+    requests = []
+    async def run():
+        runner, url = await serve(ranged_handler(requests, ['"v1"', '"v2"'], len(COMPRESSED) // 2))
+        try:
+            await download_all(url)
+        finally:
+            await runner.cleanup()
+    with pytest.raises(RuntimeError, match="changed"):
+        asyncio.run(run())
+    assert len(requests) == 2
+
+def test_stalled_download_is_resumed(monkeypatch):
+    monkeypatch.setattr(download, "_backoff", lambda attempt: 0)
+    monkeypatch.setattr(download, "DEFAULT_TIMEOUT", aiohttp.ClientTimeout(total=None, sock_read=0.2))
+    requests = []
+    async def run():
+        release = asyncio.Event()
+        async def handler(request):
+            requests.append(request.headers.copy())
+            start = int(request.headers["Range"][len("bytes="):-1]) if "Range" in request.headers else 0
+            response = web.StreamResponse(status=206 if start else 200)
+            if start:
+                response.headers["Content-Range"] = f"bytes {start}-{len(COMPRESSED) - 1}/{len(COMPRESSED)}"
+            response.content_length = len(COMPRESSED) - start
+            await response.prepare(request)
+            if len(requests) == 1:
+                await response.write(COMPRESSED[:1000])
+                await release.wait()
+                return response
+            await response.write(COMPRESSED[start:])
+            return response
+        runner, url = await serve(handler)
+        try:
+            return await asyncio.wait_for(download_all(url), 5)
+        finally:
+            release.set()
+            await runner.cleanup()
+    assert asyncio.run(run()) == DATA
+    assert requests[1]["Range"] == "bytes=1000-"
@@ -0,0 +1,59 @@
+import pytest
+from transformers.fetch_mappings import _scan_chunk
+
+SQL = (
+    b"INSERT INTO `page_props` VALUES "
+    b"(12,'displaytitle','Foo (bar',NULL),"
+    b"(12345,'wikibase_item','Q42',NULL),"
+    b"(7,'page_image_free','Paris (city).jpg',NULL),"
+    b"(678,'wikibase_item','Q1234567',NULL),"
+    b"(9,'wikibase-shortdesc','(',NULL),"
+    b"(90,'wikibase_item','Q9',NULL);\n"
+)
+EXPECTED = {12345: "Q42", 678: "Q1234567", 90: "Q9"}
+
+def scan(chunks):
+    """Scan the chunks in order like fetch_mappings does."""
+    mappings = {}
+    tail = b""
+    for chunk in chunks:
+        pairs, tail = _scan_chunk(chunk, tail)
+        mappings.update(pairs)
+    return mappings
+
+def split_at(data, *positions):
+    bounds = [0, *positions, len(data)]
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+def test_single_chunk():
+    assert scan([SQL]) == EXPECTED
+
+def test_marker_split_across_chunks():
+    marker = SQL.index(b",'wikibase_item','")
+    for offset in range(1, 18):
+        assert scan(split_at(SQL, marker + offset)) == EXPECTED
+
+def test_page_id_split_across_chunks():
+    page_id = SQL.index(b"(12345,") + 1
+    for offset in range(0, 6):
+        assert scan(split_at(SQL, page_id + offset)) == EXPECTED
+
+def test_value_split_across_chunks():
+    value = SQL.index(b"Q1234567")
+    for offset in range(0, 9):
+        assert scan(split_at(SQL, value + offset)) == EXPECTED
+
+def test_value_spanning_several_chunks():
+    value = SQL.index(b"Q1234567")
+    assert scan(split_at(SQL, value + 1, value + 3, value + 5)) == EXPECTED
+
+def test_parenthesis_in_other_values():
+    # the "(" inside the values of other properties must not be taken as the start of a tuple
+    assert scan([SQL]) == EXPECTED
+    bracket = SQL.index(b"'(',") + 1
+    assert scan(split_at(SQL, bracket, bracket + 1)) == EXPECTED
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, 64])
+def test_every_chunk_size(size):
+    chunks = [SQL[start:start + size] for start in range(0, len(SQL), size)]
+    assert scan(chunks) == EXPECTED
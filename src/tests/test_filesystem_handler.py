@@ -0,0 +1,38 @@
+import asyncio
+import json
+from output_handlers import FilesystemHandler
+
+def test_concurrent_writes_are_all_written(tmp_path, write_concurrently):
+    # more entries than fit into the batches of all writers at once
+    handler = write_concurrently(FilesystemHandler.create, 2000, output_dir=tmp_path)
+    assert len(list(tmp_path.glob("*.json"))) == 2000
+    assert json.loads((tmp_path / "Q1234.json").read_text())["properties"]["title"] == "Title 1234"
+    assert handler._successful_writes == 2000
+
+def test_payload_is_written_as_is(tmp_path):
+    async def run():
+        handler = await FilesystemHandler.create(output_dir=tmp_path)
+        await handler.write_entry({}, "Q1", b'{"pre":"encoded"}')
+        await handler.close()
+    asyncio.run(run())
+    assert (tmp_path / "Q1.json").read_bytes() == b'{"pre":"encoded"}'
+
+def test_failed_writes_are_counted(tmp_path, entries):
+    async def run():
+        handler = await FilesystemHandler.create(output_dir=tmp_path, fail_on_error=False)
+        # a directory in the way of the file
+        (tmp_path / "Q1.json").mkdir()
+        await asyncio.gather(*[handler.write_entry(entry, uid) for entry, uid in entries(3)])
+        await handler.close()
+        return handler
+    handler = asyncio.run(run())
+    assert handler._successful_writes == 2
+    assert handler._failed_writes == 1
+
+def test_sharded_output(tmp_path, write_concurrently):
+    write_concurrently(FilesystemHandler.create, 200, output_dir=tmp_path, shard=True)
+    assert not list(tmp_path.glob("*.json"))
+    assert (tmp_path / "45" / "Q145.json").is_file()
+    # the last two characters of short ids include the prefix
+    assert (tmp_path / "Q5" / "Q5.json").is_file()
+    assert len(list(tmp_path.glob("*/*.json"))) == 200
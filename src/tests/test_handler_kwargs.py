@@ -0,0 +1,40 @@
+import pytest
+from main import gather_handler_kwargs
+from output_handlers import FilesystemHandler
+from output_handlers.s3 import S3Handler
+
+def test_schema_types():
+    environ = {
+        "HANDLER_S3_BATCH_SIZE": "10",
+        "HANDLER_S3_SECRET_KEY": "0755",
+        "HANDLER_S3_FAIL_ON_ERROR": "False",
+        "HANDLER_FILESYSTEM_SHARD": "true",
+        "OTHER": "1",
+    }
+    assert gather_handler_kwargs("s3", environ, S3Handler.ENV_SCHEMA) == {
+        "batch_size": 10, "secret_key": "0755", "fail_on_error": False,
+    }
+
+def test_options_without_schema_are_guessed():
+    environ = {"HANDLER_CUSTOM_PORT": "2222", "HANDLER_CUSTOM_TLS": "true", "HANDLER_CUSTOM_HOST": "example.org"}
+    assert gather_handler_kwargs("custom", environ) == {"port": 2222, "tls": True, "host": "example.org"}
+
+@pytest.mark.parametrize("value, expected", [
+    ("true", True), ("TRUE", True), ("1", True), ("yes", True),
+    ("false", False), ("False", False), ("0", False), ("no", False),
+])
+def test_bool_values(value, expected):
+    environ = {"HANDLER_FILESYSTEM_SHARD": value}
+    assert gather_handler_kwargs("filesystem", environ, FilesystemHandler.ENV_SCHEMA) == {"shard": expected}
+
+@pytest.mark.parametrize("key, value", [
+    ("HANDLER_FILESYSTEM_FAIL_ON_ERROR", "flase"),
+    ("HANDLER_FILESYSTEM_SHARD", ""),
+])
+def test_invalid_bool_raises(key, value):
+    with pytest.raises(ValueError, match=key):
+        gather_handler_kwargs("filesystem", {key: value}, FilesystemHandler.ENV_SCHEMA)
+
+def test_invalid_int_raises():
+    with pytest.raises(ValueError, match="HANDLER_S3_BATCH_SIZE"):
+        gather_handler_kwargs("s3", {"HANDLER_S3_BATCH_SIZE": "ten"}, S3Handler.ENV_SCHEMA)
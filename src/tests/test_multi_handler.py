@@ -0,0 +1,66 @@
+import asyncio
+import orjson
+from output_handlers import BaseHandler, MultiHandler
+
+class RecordingHandler(BaseHandler):
+    """Keeps the written entries in memory."""
+
+    @classmethod
+    async def create(cls, **kwargs) -> "RecordingHandler":
+        obj = await super().create(**kwargs)
+        obj.written = []
+        obj.closed = False
+        return obj
+
+    async def _write_entry(self, entry: dict, uid: str, payload: bytes | None = None) -> bool:
+        self.written.append((uid, entry, payload))
+        return True
+
+    async def close(self):
+        self.closed = True
+        await super().close()
+
+async def create_handlers(n):
+    return [await RecordingHandler.create() for _ in range(n)]
+
+def test_entries_reach_every_handler(entries):
+    async def run():
+        handlers = await create_handlers(3)
+        multi = MultiHandler(handlers)
+        for entry, uid in entries(2):
+            await multi.write_entry(entry, uid)
+        await multi.write_entries(entries(5))
+        await multi.close()
+        return handlers
+    for handler in asyncio.run(run()):
+        assert [uid for uid, _, _ in handler.written] == ["Q0", "Q1", "Q0", "Q1", "Q2", "Q3", "Q4"]
+        assert handler.closed
+        assert handler._successful_writes == 7
+
+class LegacyHandler(RecordingHandler):
+    """Implements the original two-argument _write_entry."""
+
+    async def _write_entry(self, entry: dict, uid: str) -> bool:
+        self.written.append((uid, entry, None))
+        return True
+
+def test_payload_is_encoded_once_and_shared(entries):
+    async def run():
+        handlers = await create_handlers(2)
+        await MultiHandler(handlers).write_entries(entries(3))
+        return handlers
+    first, second = asyncio.run(run())
+    assert [payload for _, _, payload in first.written] == [orjson.dumps(entry) for entry, _ in entries(3)]
+    assert all(a is b for (_, _, a), (_, _, b) in zip(first.written, second.written))
+
+def test_handlers_without_payload_parameter(entries):
+    async def run():
+        handlers = [await LegacyHandler.create(), await RecordingHandler.create()]
+        multi = MultiHandler(handlers)
+        await multi.write_entry(*entries(1)[0])
+        await multi.write_entries(entries(2))
+        return handlers
+    legacy, recording = asyncio.run(run())
+    assert [uid for uid, _, _ in legacy.written] == ["Q0", "Q0", "Q1"]
+    assert legacy._successful_writes == 3
+    assert recording.written[0][2] is not None
@@ -331,3 +331,9 @@ def test_full_boston_snapshot(parser):
     expected = json.load(open(out, encoding="utf-8"))
     got = parser.parse(wikicode)
     assert dump(got) == dump(expected)
+
+@pytest.mark.parametrize("indent", [None, 2, 4])
+def test_export_json_matches_json_dumps(parser, indent):
+    tree = parser.parse("Café\n== See ==\n{{see|name=Museum|content=<b>x</b>}}")
+    # the same output as json.dumps, except that non-ASCII text is not escaped
+    assert parser.export_json(indent=indent) == json.dumps(tree, indent=indent, ensure_ascii=False)
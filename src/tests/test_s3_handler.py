@@ -0,0 +1,84 @@
+import asyncio
+from functools import partial
+import threading
+import orjson
+import zstandard
+from output_handlers import s3
+from output_handlers.s3 import S3Handler
+
+async def create_handler(monkeypatch, fail=False, **kwargs):
+    """S3Handler with a fake put_object that records the uploaded objects, or raises if `fail` is set."""
+    async def bucket_exists(self):
+        pass
+    monkeypatch.setattr(S3Handler, "_ensure_bucket_exists", bucket_exists)
+    monkeypatch.setattr(s3, "BATCH_LINGER", 0.01)
+    handler = await S3Handler.create(
+        url="http://127.0.0.1:1", access_key="key", secret_key="secret", bucket_name="bucket", **kwargs
+    )
+    handler.uploads = {}
+    async def put_object(Bucket, Key, Body, **extra):
+        # let other writes interleave like with a real upload
+        await asyncio.sleep(0)
+        if fail:
+            raise ConnectionError("upload failed")
+        handler.uploads[Key] = Body
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}}
+    handler.client.put_object = put_object
+    return handler
+
+def lines(entries):
+    return sorted(uid.encode() + b"\t" + orjson.dumps(entry) for entry, uid in entries)
+
+def test_one_object_per_entry(monkeypatch, entries, write_concurrently):
+    handler = write_concurrently(partial(create_handler, monkeypatch), 3)
+    assert handler.uploads == {f"{uid}.json": orjson.dumps(entry) for entry, uid in entries(3)}
+
+def test_batched_uploads(monkeypatch, entries, write_concurrently):
+    handler = write_concurrently(partial(create_handler, monkeypatch), 7, batch_size=3)
+    # the last, incomplete batch is uploaded on close
+    assert sorted(handler.uploads) == ["batch-000000.ndjson", "batch-000001.ndjson", "batch-000002.ndjson"]
+    assert sorted(b"".join(handler.uploads.values()).splitlines()) == lines(entries(7))
+    assert handler._successful_writes == 7
+
+def test_zstd_compressed_uploads(monkeypatch, entries, write_concurrently):
+    handler = write_concurrently(partial(create_handler, monkeypatch), 4, batch_size=2, zstd_level=3)
+    assert sorted(handler.uploads) == ["batch-000000.ndjson.zst", "batch-000001.ndjson.zst"]
+    decompress = zstandard.ZstdDecompressor().decompress
+    uploaded = b"".join(decompress(body) for body in handler.uploads.values())
+    assert sorted(uploaded.splitlines()) == lines(entries(4))
+
+def test_failed_batches_fail_every_entry(monkeypatch, write_concurrently):
+    handler = write_concurrently(partial(create_handler, monkeypatch), 25, batch_size=10, fail=True, fail_on_error=False)
+    assert handler._successful_writes == 0
+    assert handler._failed_writes == 25
+
+def test_failed_batches_raise_for_every_entry(monkeypatch, entries):
+    async def run():
+        handler = await create_handler(monkeypatch, batch_size=10, fail=True)
+        results = await asyncio.gather(
+            *[handler.write_entry(entry, uid) for entry, uid in entries(25)], return_exceptions=True
+        )
+        await handler.close()
+        return results
+    results = asyncio.run(run())
+    assert all(isinstance(result, Exception) for result in results)
+
+def test_partial_batch_is_uploaded_without_close(monkeypatch, entries):
+    async def run():
+        handler = await create_handler(monkeypatch, batch_size=10)
+        await asyncio.gather(*[handler.write_entry(entry, uid) for entry, uid in entries(3)])
+        uploads = dict(handler.uploads)
+        await handler.close()
+        return uploads
+    assert list(asyncio.run(run())) == ["batch-000000.ndjson"]
+
+def test_compression_runs_off_the_event_loop(monkeypatch, write_concurrently):
+    threads = set()
+    compress = s3._compress
+    def recording_compress(level, data):
+        threads.add(threading.current_thread())
+        return compress(level, data)
+    monkeypatch.setattr(s3, "_compress", recording_compress)
+    handler = write_concurrently(partial(create_handler, monkeypatch), 4, zstd_level=19)
+    assert threading.main_thread() not in threads
+    assert sorted(handler.uploads) == [f"Q{i}.json.zst" for i in range(4)]
@@ -0,0 +1,132 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from transformers import wiki_dump_handler
+from transformers import WikiDumpHandler
+
+def page(page_id, title, text, redirect=False):
+    redirect_tag = f'<redirect title="{title} (target)" />' if redirect else ""
+    return (
+        f"<page><title>{title}</title><ns>0</ns><id>{page_id}</id>{redirect_tag}"
+        f"<revision><id>{page_id}00</id><text bytes=\"{len(text)}\" xml:space=\"preserve\">{text}</text></revision></page>"
+    ).encode()
+
+def dump(pages):
+    return (
+        b'<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.11/" version="0.11" xml:lang="en">'
+        b"<siteinfo><sitename>Wikivoyage</sitename></siteinfo>"
+        + b"".join(pages)
+        + b"</mediawiki>"
+    )
+
+DUMP = dump([
+    page(1, "Berlin", "== See ==\n{{see|name=Museum|content=Old &amp; ''new''}}"),
+    page(2, "Unmapped", "text"),
+    page(3, "Old Berlin", "#REDIRECT [[Berlin]]", redirect=True),
+    page(4, "Paris", "Intro\n== Eat ==\nCroissants"),
+])
+MAPPINGS = {1: "Q64", 3: "Q1", 4: "Q90"}
+
+class RecordingHandler:
+    """Collects the written entries, optionally waiting for `release` or failing every write."""
+
+    def __init__(self, fail=False):
+        self.written = []
+        self.batches = []
+        self.fail = fail
+        self.release = None
+
+    async def write_entries(self, entries):
+        if self.release is not None:
+            await self.release.wait()
+        if self.fail:
+            raise ConnectionError("write failed")
+        self.batches.append(len(entries))
+        self.written.extend(entries)
+
+def chunks(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+async def process(data, handler, chunk_size, mappings=MAPPINGS, **kwargs):
+    dump_handler = WikiDumpHandler(mappings, handler, **kwargs)
+    for chunk in chunks(data, chunk_size):
+        await dump_handler.feed(chunk)
+    await dump_handler.close()
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, len(DUMP)])
+def test_mapped_pages_are_written(chunk_size):
+    handler = RecordingHandler()
+    asyncio.run(process(DUMP, handler, chunk_size))
+    written = {uid: entry for entry, uid in handler.written}
+    # the unmapped page and the redirect are skipped
+    assert sorted(written) == ["Q64", "Q90"]
+    assert written["Q64"]["properties"]["title"] == "Berlin"
+    assert written["Q90"]["properties"]["title"] == "Paris"
+    see = written["Q64"]["children"][0]["children"][0]
+    assert see["type"] == "see"
+    # the XML entity is decoded before the wikitext is parsed
+    assert see["properties"]["content"] == "Old & *new*"
+
+def test_pages_are_parsed_in_the_executor():
+    handler = RecordingHandler()
+    async def run():
+        with ThreadPoolExecutor(2) as executor:
+            await process(DUMP, handler, 13, executor=executor)
+    asyncio.run(run())
+    assert sorted(uid for _, uid in handler.written) == ["Q64", "Q90"]
+
+def test_close_writes_the_last_partial_batch():
+    pages = [page(i, f"Page {i}", f"Text {i}") for i in range(1, 71)]
+    mappings = {i: f"Q{i}" for i in range(1, 71)}
+    handler = RecordingHandler()
+    asyncio.run(process(dump(pages), handler, 100, mappings, max_concurrent=1))
+    assert handler.batches == [wiki_dump_handler.WRITE_BATCH_SIZE, 70 - wiki_dump_handler.WRITE_BATCH_SIZE]
+    assert sorted(uid for _, uid in handler.written) == sorted(f"Q{i}" for i in range(1, 71))
+
+def test_feed_waits_for_busy_workers(monkeypatch):
+    monkeypatch.setattr(wiki_dump_handler, "WRITE_BATCH_SIZE", 1)
+    pages = [page(i, f"Page {i}", f"Text {i}") for i in range(1, 11)]
+    mappings = {i: f"Q{i}" for i in range(1, 11)}
+    handler = RecordingHandler()
+    async def run():
+        handler.release = asyncio.Event()
+        dump_handler = WikiDumpHandler(mappings, handler, max_concurrent=1)
+        # one page in the blocked worker and a full queue, the rest cannot be queued
+        feeding = asyncio.create_task(dump_handler.feed(dump(pages)))
+        await asyncio.sleep(0.05)
+        assert not feeding.done()
+        handler.release.set()
+        await feeding
+        await dump_handler.close()
+    asyncio.run(run())
+    assert len(handler.written) == 10
+
+def test_handlers_without_bulk_api():
+    class SingleEntryHandler:
+        def __init__(self):
+            self.written = []
+        async def write_entry(self, entry, uid):
+            self.written.append(uid)
+    handler = SingleEntryHandler()
+    asyncio.run(process(DUMP, handler, 64))
+    assert sorted(handler.written) == ["Q64", "Q90"]
+
+def test_handler_errors_reach_the_caller():
+    with pytest.raises(ConnectionError):
+        asyncio.run(process(DUMP, RecordingHandler(fail=True), 7))
+
+def test_handler_errors_stop_feeding(monkeypatch):
+    monkeypatch.setattr(wiki_dump_handler, "WRITE_BATCH_SIZE", 1)
+    pages = [page(i, f"Page {i}", f"Text {i}") for i in range(1, 101)]
+    mappings = {i: f"Q{i}" for i in range(1, 101)}
+    fed = []
+    async def run():
+        dump_handler = WikiDumpHandler(mappings, RecordingHandler(fail=True), max_concurrent=1)
+        for chunk in chunks(dump(pages), 200):
+            fed.append(chunk)
+            await dump_handler.feed(chunk)
+        await dump_handler.close()
+    with pytest.raises(ConnectionError):
+        asyncio.run(run())
+    # raised by feed, long before the end of the dump
+    assert len(fed) < len(chunks(dump(pages), 200))
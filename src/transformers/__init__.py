@@ -1,3 +1,4 @@
+from .download import download_decompressed
 from .fetch_mappings import fetch_mappings
 from .wiki_dump_handler import WikiDumpHandler
 from .parser import WikivoyageParser
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""Streaming download of compressed dumps, decompressed in a worker thread."""
+from logging import getLogger
+from typing import Callable
+import asyncio
+import random
+import aiohttp
+
+logger = getLogger(__name__)
+
+# size of the response read buffer, aiohttp's default of 64 KiB pauses the socket after every few chunks
+READ_BUFSIZE = 4 * 1024 * 1024
+# attempts to resume a failed download before giving up
+MAX_RETRIES = 5
+# upper bound in seconds for the wait between two attempts
+MAX_BACKOFF = 60
+# seconds without any data from the server after which a download counts as stalled
+SOCK_READ_TIMEOUT = 60
+# used if the caller passes no timeout, a None would disable all timeouts, the session's included.
+# No total, a long download that keeps receiving data is fine and a stalled one is resumed
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_read=SOCK_READ_TIMEOUT)
+
+
+def _backoff(attempt: int) -> float:
+    """
+    Exponential backoff with jitter, so concurrent clients do not retry in lockstep.
+    """
+    return min(2 ** attempt, MAX_BACKOFF) * (0.5 + random.random())
+
+
+def _is_retryable(e: Exception) -> bool:
+    # client errors (404, 403, ...) will not go away by asking again
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status >= 500 or e.status == 429
+    return isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+async def download_decompressed(
+    session: aiohttp.ClientSession,
+    url: str,
+    decompress: Callable[[bytes], bytes],
+    queue: asyncio.Queue,
+    batch_size: int,
+    timeout: aiohttp.ClientTimeout | None = None,
+):
+    """
+    Producer stage for the dump pipelines: download `url` and put the decompressed data on the queue.
+    The compressed data is collected into batches of `batch_size`, so the thread hand-off is not paid per network chunk.
+    Decompression runs in a worker thread (zlib, isal and bz2 release the GIL), so it overlaps with the consumer on the event loop,
+    while the bounded queue keeps the download from running ahead of it.
+    If the connection fails or stalls, the download is retried up to MAX_RETRIES times and resumed
+    with a Range request from the last received byte, instead of starting the dump over.
+    The request carries an If-Range with the ETag (or Last-Modified) of the first response,
+    so a file replaced in the meantime makes the download fail instead of mixing the bytes of two files.
+    A None on the queue marks the end of the data, also if the download failed.
+    """
+    if timeout is None:
+        timeout = DEFAULT_TIMEOUT
+    loop = asyncio.get_running_loop()
+    buffer = bytearray()
+    # compressed bytes received so far, where a resumed download continues
+    received = 0
+    # ETag or Last-Modified of the file the received bytes belong to
+    validator = None
+    attempt = 0
+    try:
+        while True:
+            headers = None
+            if received:
+                headers = {"Range": f"bytes={received}-"}
+                if validator is not None:
+                    headers["If-Range"] = validator
+            received_before = received
+            try:
+                async with session.get(url, headers=headers, timeout=timeout, read_bufsize=READ_BUFSIZE) as resp:
+                    resp.raise_for_status()
+                    if not received:
+                        # weak ETags are not allowed in If-Range
+                        etag = resp.headers.get("ETag")
+                        validator = etag if etag and not etag.startswith("W/") else resp.headers.get("Last-Modified")
+                    elif resp.status != 206 or not resp.headers.get("Content-Range", "").startswith(f"bytes {received}-"):
+                        # the decompressor has already consumed the start, it cannot be fed another file or offset
+                        raise RuntimeError(
+                            f"Cannot resume the download of {url}, the file changed or the server does not support ranges"
+                        )
+                    # hand over whatever has arrived, without re-chunking it into fixed sizes first
+                    async for chunk in resp.content.iter_any():
+                        received += len(chunk)
+                        buffer += chunk
+                        if len(buffer) < batch_size:
+                            continue
+                        data = await loop.run_in_executor(None, decompress, buffer)
+                        buffer.clear()
+                        if data:
+                            await queue.put(data)
+                break
+            except Exception as e:
+                # a retry only counts as such if the previous attempt made no progress
+                if received > received_before:
+                    attempt = 0
+                if attempt >= MAX_RETRIES or not _is_retryable(e):
+                    raise
+                delay = _backoff(attempt)
+                attempt += 1
+                logger.warning("Download of %s failed after %d bytes (%s), retrying in %.1fs", url, received, e, delay)
+                await asyncio.sleep(delay)
+        if buffer:
+            data = await loop.run_in_executor(None, decompress, buffer)
+            if data:
+                await queue.put(data)
+    finally:
+        await queue.put(None)
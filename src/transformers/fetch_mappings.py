@@ -1,42 +1,72 @@
 from logging import getLogger
-import zlib
-import re
+import asyncio
 import aiohttp
+# ISA-L inflates gzip considerably faster than zlib, with the same interface
+from isal import isal_zlib as zlib
+from .download import download_decompressed
 
 logger = getLogger(__name__)
 
-async def fetch_mappings() -> dict[str, str]:
+# tuples look like (page,'prop','value',NULL_or_number), only the wikibase_item ones are of interest
+MARKER = b",'wikibase_item','"
+# bytes carried over to the next chunk when no tuple is pending, enough for "(<page id>" plus a split marker
+TAIL_SIZE = 64
+# amount of compressed data handed to the decompressor at once
+DECOMPRESS_BATCH_SIZE = 1024 * 1024
+
+def _scan_chunk(data: bytes, tail: bytes) -> tuple[list[tuple[int, str]], bytes]:
+    """
+    Extract the (page id, wikibase_item) pairs from the next chunk of the decompressed dump.
+    `tail` is the unprocessed end of the previous chunk, the new one is returned alongside the pairs.
+    All searching is done with bytes.find/rfind, so the per-byte work stays in C and only matches are decoded.
+    """
+    scan = tail + data
+    pairs = []
+    pos = 0
+    while True:
+        idx = scan.find(MARKER, pos)
+        if idx == -1:
+            # keep enough to catch a marker (and its page id) split across chunks
+            return pairs, scan[max(pos, len(scan) - TAIL_SIZE):]
+        start = scan.rfind(b"(", pos, idx)
+        value_start = idx + len(MARKER)
+        value_end = scan.find(b"'", value_start)
+        if value_end == -1:
+            # the tuple continues in the next chunk
+            return pairs, scan[start if start != -1 else idx:]
+        page_id = scan[start + 1:idx]
+        if start != -1 and page_id.isdigit():
+            pairs.append((int(page_id), scan[value_start:value_end].decode("ascii")))
+        pos = value_end
+
+async def fetch_mappings(session: aiohttp.ClientSession) -> dict[int, str]:
     """
     Download and gunzip the page_props SQL dump, extract
     page→wikibase_item mappings.
+    The page ids are kept as ints, which are smaller and faster to hash than their string form.
     """
     sql_url = (
         "https://dumps.wikimedia.org/"
         "enwikivoyage/latest/"
         "enwikivoyage-latest-page_props.sql.gz"
     )
-    # decompress gzip
+    # the bounded queue keeps the download from running ahead of the scan
+    queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=4)
+    # gzip, decompressed in a worker thread while the previous chunk is scanned
     decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
-    # regex for tuples: (page,'prop','value',NULL_or_number)
-    tuple_re = re.compile(r"\((\d+),'([^']+)','([^']+)',(NULL|[\d\.]+)\)")
-    buffer = ""
-    mappings: dict[str, str] = {}
+    producer = asyncio.create_task(
+        download_decompressed(session, sql_url, decomp.decompress, queue, DECOMPRESS_BATCH_SIZE)
+    )
+    tail = b""
+    mappings: dict[int, str] = {}
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(sql_url) as resp:
-            resp.raise_for_status()
-            async for chunk in resp.content.iter_chunked(1024 * 1024):
-                data = decomp.decompress(chunk)
-                if not data:
-                    continue
-                text = data.decode("utf-8", errors="ignore")
-                buffer += text
-                for m in tuple_re.finditer(buffer):
-                    page_id, prop, value = m.group(1), m.group(2), m.group(3)
-                    if prop == "wikibase_item":
-                        logger.debug(f"Found mapping {page_id} -> {value}")
-                        mappings[page_id] = value
-                # keep tail to handle split tuples
-                if len(buffer) > 1000:
-                    buffer = buffer[-1000:]
+    try:
+        while (data := await queue.get()) is not None:
+            pairs, tail = _scan_chunk(data, tail)
+            logger.debug("Found %d mappings in chunk", len(pairs))
+            mappings.update(pairs)
+        # raises if the download failed
+        await producer
+    finally:
+        producer.cancel()
     return mappings
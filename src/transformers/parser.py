@@ -1,17 +1,50 @@
 """Where the magic happens: parsing wikitext into a structured JSON tree."""
 import mwparserfromhell as mwp
 import mwparserfromhell.nodes as nodes
+from mwparserfromhell.nodes.extras import Parameter
+from mwparserfromhell.wikicode import Wikicode
 import json
+import orjson
 from typing import Dict
 
 
-DOCUMENT_TEMPLATES = [
+# frozensets for constant time membership tests
+DOCUMENT_TEMPLATES = frozenset([
     "pagebanner", "mapframe", "routebox", "geo", "isPartOf",
     "usablecity", "guidecity", "outlinecity"
-]
-LISTING_TEMPLATES = [
+])
+LISTING_TEMPLATES = frozenset([
     "see", "do", "buy", "eat", "drink", "sleep", "listing"
-]
+])
+
+# (prefix, suffix) that turn the content of a simple HTML tag into markdown
+_TAG_WRAP = {
+    "b": ("**", "**"), "strong": ("**", "**"),
+    "i": ("*", "*"), "em": ("*", "*"),
+    "u": ("_", "_"),
+    "strike": ("~~", "~~"), "s": ("~~", "~~"), "del": ("~~", "~~"),
+    "code": ("`", "`"),
+    "pre": ("```\n", "\n```"),
+    **{f"h{level}": (f"\n{'#' * level} ", "\n") for level in range(1, 7)},
+}
+# markdown of tags without content
+_TAG_CONST = {"br": "\n", "hr": "\n---\n"}
+
+def _node(node_type: str, properties: dict) -> Dict:
+    """Create a tree node (a dict display is built at its final size in one step)"""
+    return {"type": node_type, "properties": properties, "children": []}
+
+def _text_value(node: nodes.Text) -> str:
+    """Plain text nodes are used as they are"""
+    return str(node.value)
+
+def _skip(node: nodes.Node) -> str:
+    """Drop the node from the text"""
+    return ""
+
+def _param_kv(param: Parameter) -> tuple[str, str]:
+    """Name and value of a template parameter as stripped strings"""
+    return str(param.name).strip(), str(param.value).strip()
 
 class WikivoyageParser:
     """
@@ -19,21 +52,37 @@ class WikivoyageParser:
     This class uses mwparserfromhell to parse the wikitext and convert it into a structured JSON format.
     """
     def __init__(self):
-        self.root = {
-            "type": "root",
-            "properties": {},
-            "children": []
-        }
+        self.root = _node("root", {})
         self.current_section = self.root
+        # open sections as (level, node), the root acts as level 0
+        self.section_stack = [(0, self.root)]
+
+        # Dispatch tables keyed by the exact node class, one dict lookup per node instead of an isinstance chain.
+        # Nodes that end the current text and are handled on their own
+        self._block_handlers = {
+            nodes.Heading: self._handle_heading,
+            nodes.Template: self._handle_template,
+        }
+        # Nodes that are converted to markdown, anything else is used as is (str(node))
+        self._markdown_converters = {
+            nodes.Text: _text_value,
+            nodes.Tag: self._convert_tag_to_markdown,
+            nodes.Wikilink: self._convert_wikilink_to_markdown,
+            nodes.ExternalLink: self._convert_external_link_to_markdown,
+        }
+        # Top level text additionally drops comments
+        self._text_converters = {**self._markdown_converters, nodes.Comment: _skip}
+        # Templates by their lowercased name, anything else is a general template node
+        self._template_handlers = {
+            **{name: self._handle_document_template for name in DOCUMENT_TEMPLATES},
+            **{name: self._handle_listing_template for name in LISTING_TEMPLATES},
+        }
 
     def parse(self, wikitext: str) -> Dict:
         """Parse wikitext and return structured JSON tree"""
-        self.root = {
-            "type": "root",
-            "properties": {},
-            "children": []
-        }
+        self.root = _node("root", {})
         self.current_section = self.root
+        self.section_stack = [(0, self.root)]
         
         # Parse the wikitext
         parsed = mwp.parse(wikitext)
@@ -43,154 +92,86 @@ class WikivoyageParser:
         
         return self.root
 
-    def _process_nodes(self, wikicode):
+    def _process_nodes(self, wikicode: Wikicode):
         """Process all nodes in the wikicode"""
-        current_text = ""
+        # text fragments are collected and joined once, instead of re-concatenating the string for each node
+        current_text: list[str] = []
+        
+        # bound methods hoisted into locals, this loop runs for every node of the page
+        get_handler = self._block_handlers.get
+        get_converter = self._text_converters.get
+        add_text = current_text.append
+        add_text_node = self._add_text_node
         
         for node in wikicode.nodes:
-            # Handle different node types
-            if isinstance(node, nodes.heading.Heading):
+            node_type = type(node)
+            handler = get_handler(node_type)
+            if handler is not None:
                 # First flush any pending text
                 if current_text:
-                    self._add_text_node(current_text)
-                    current_text = ""
-                
-                # Create new section
-                self._handle_heading(node)
-                
-            elif isinstance(node, nodes.template.Template):
-                # First flush any pending text
-                if current_text:
-                    self._add_text_node(current_text)
-                    current_text = ""
-                
-                # Handle template
-                self._handle_template(node)
-                
-            elif isinstance(node, nodes.text.Text):
-                # Accumulate text
-                current_text += str(node.value)
-                
-            elif isinstance(node, nodes.tag.Tag):
-                # Handle tag (potential styling)
-                tag_text = self._convert_tag_to_markdown(node)
-                current_text += tag_text
-                
-            elif isinstance(node, nodes.wikilink.Wikilink):
-                # Handle wikilink
-                link_text = self._convert_wikilink_to_markdown(node)
-                current_text += link_text
-                
-            elif isinstance(node, nodes.external_link.ExternalLink):
-                # Handle external link
-                link_text = self._convert_external_link_to_markdown(node)
-                current_text += link_text
-                
-            elif isinstance(node, nodes.comment.Comment):
-                # Skip comments
-                pass
+                    add_text_node("".join(current_text))
+                    current_text.clear()
                 
+                # Create new section or handle template
+                handler(node)
             else:
-                # Process other nodes as text
-                current_text += str(node)
+                # Accumulate text, other nodes are processed as text
+                add_text(get_converter(node_type, str)(node))
         
         # Add any remaining text
         if current_text:
-            self._add_text_node(current_text)
+            add_text_node("".join(current_text))
 
     def _add_text_node(self, text: str):
         """Add a text node to the current section"""
         # Avoid adding empty text nodes
-        if not text.strip():
+        text = text.strip()
+        if not text:
             return
             
-        text_node = {
-            "type": "text",
-            "properties": {
-                "markdown": text.strip()
-            },
-            "children": []
-        }
+        text_node = _node("text", {"markdown": text})
         
         self.current_section["children"].append(text_node)
 
-    def _handle_heading(self, heading_node):
+    def _handle_heading(self, heading_node: nodes.Heading):
         """Handle a heading node by creating a new section"""
         level = heading_node.level
         title = str(heading_node.title).strip()
         
         # Create new section node
-        section = {
-            "type": "section",
-            "properties": {
-                "title": title,
-                "level": level
-            },
-            "children": []
-        }
+        section = _node("section", {"title": title, "level": level})
         
-        # Find the appropriate parent section based on level
-        parent = self.root
-        
-        # If the level is 1, the parent is the root
-        if level > 1:
-            # Start from root and traverse the tree
-            current = self.root
-            current_level = 0
-            
-            for child in reversed(self._get_all_sections()):
-                child_level = child["properties"]["level"]
-                if child_level < level:
-                    parent = child
-                    break
+        # Close all sections at the same or a deeper level, the parent is
+        # the closest open section with a lower level (the root for level 1)
+        stack = self.section_stack
+        if level == 1:
+            # the most common case, top level sections always close everything but the root
+            del stack[1:]
+        else:
+            while stack[-1][0] >= level:
+                stack.pop()
+        parent = stack[-1][1]
         
         # Add the section to its parent
         parent["children"].append(section)
+        stack.append((level, section))
         
         # Update current section
         self.current_section = section
 
-    def _get_all_sections(self):
-        """Get all sections in the document in the order they appear"""
-        sections = []
-        
-        def collect_sections(node):
-            if node["type"] == "section":
-                sections.append(node)
-            for child in node["children"]:
-                if child["type"] == "section":
-                    collect_sections(child)
-        
-        collect_sections(self.root)
-        return sections
-
-    def _handle_template(self, template_node):
+    def _handle_template(self, template_node: nodes.Template):
         """Handle a template node"""
         template_name = str(template_node.name).strip().lower()
         
-        # Check if it's a document-wide template
-        if template_name in DOCUMENT_TEMPLATES:
-            self._handle_document_template(template_node)
-            return
-            
-        # Check if it's a listing template
-        if template_name in LISTING_TEMPLATES:
-            self._handle_listing_template(template_node)
-            return
-            
-        # Handle other templates as regular nodes
-        self._handle_other_template(template_node)
+        # Document-wide and listing templates have their own handlers,
+        # other templates are handled as regular nodes
+        handler = self._template_handlers.get(template_name, self._handle_other_template)
+        handler(template_node, template_name)
 
-    def _handle_document_template(self, template_node):
+    def _handle_document_template(self, template_node: nodes.Template, template_name: str):
         """Handle document-wide templates by adding to root properties"""
-        template_name = str(template_node.name).strip().lower()
-        
         # Extract parameters
-        params = {}
-        for param in template_node.params:
-            name = str(param.name).strip()
-            value = str(param.value).strip()
-            params[name] = value
+        params = dict(map(_param_kv, template_node.params))
             
         # Add to root properties
         if template_name not in self.root["properties"]:
@@ -198,110 +179,69 @@ class WikivoyageParser:
             
         self.root["properties"][template_name] = params
 
-    def _handle_listing_template(self, template_node):
+    def _handle_listing_template(self, template_node: nodes.Template, template_name: str):
         """Handle listing templates (see, do, buy, eat, drink, sleep)"""
-        template_name = str(template_node.name).strip().lower()
-        
         # Extract parameters
         properties = {}
         for param in template_node.params:
             name = str(param.name).strip()
-            value = str(param.value).strip()
             
-            # Convert content to markdown if it's in the 'content' parameter
+            # Convert content to markdown if it's in the 'content' parameter,
+            # its plain string would only be thrown away
             if name == "content":
-                value = self._convert_wikicode_to_markdown(param.value)
-                
-            properties[name] = value
+                properties[name] = self._convert_wikicode_to_markdown(param.value)
+            else:
+                properties[name] = str(param.value).strip()
             
         # Create listing node
-        listing_node = {
-            "type": template_name,
-            "properties": properties,
-            "children": []
-        }
+        listing_node = _node(template_name, properties)
         
         # Add to current section
         self.current_section["children"].append(listing_node)
 
-    def _handle_other_template(self, template_node):
+    def _handle_other_template(self, template_node: nodes.Template, template_name: str):
         """Handle other templates as general template nodes"""
-        template_name = str(template_node.name).strip().lower()
-        
         # Extract parameters
         properties = {
             "name": template_name,
-            "params": {}
+            "params": dict(map(_param_kv, template_node.params))
         }
-        
-        for param in template_node.params:
-            name = str(param.name).strip()
-            value = str(param.value).strip()
-            properties["params"][name] = value
             
         # Create template node
-        template_node = {
-            "type": "template",
-            "properties": properties,
-            "children": []
-        }
+        node = _node("template", properties)
         
         # Add to current section
-        self.current_section["children"].append(template_node)
+        self.current_section["children"].append(node)
 
-    def _convert_wikicode_to_markdown(self, wikicode) -> str:
+    def _convert_wikicode_to_markdown(self, wikicode: Wikicode) -> str:
         """Convert wikicode to markdown"""
-        markdown = ""
+        get_converter = self._markdown_converters.get
         
-        for node in wikicode.nodes:
-            if isinstance(node, nodes.text.Text):
-                markdown += str(node.value)
-                
-            elif isinstance(node, nodes.tag.Tag):
-                markdown += self._convert_tag_to_markdown(node)
-                
-            elif isinstance(node, nodes.wikilink.Wikilink):
-                markdown += self._convert_wikilink_to_markdown(node)
-                
-            elif isinstance(node, nodes.external_link.ExternalLink):
-                markdown += self._convert_external_link_to_markdown(node)
-                
-            else:
-                # For other nodes, just use their string representation
-                markdown += str(node)
+        # For other nodes, just use their string representation
+        markdown = "".join([get_converter(type(node), str)(node) for node in wikicode.nodes])
                 
         return markdown.strip()
 
-    def _convert_tag_to_markdown(self, tag_node) -> str:
+    def _convert_tag_to_markdown(self, tag_node: nodes.Tag) -> str:
         """Convert HTML tag to markdown"""
         tag = str(tag_node.tag).lower()
-        content = str(tag_node.contents)
+        
+        # Tags without content, no need to look at it
+        const = _TAG_CONST.get(tag)
+        if const is not None:
+            return const
         
         # Convert the content recursively to handle nested tags
-        if tag_node.contents:
-            content = self._convert_wikicode_to_markdown(tag_node.contents)
+        content = self._convert_wikicode_to_markdown(tag_node.contents) if tag_node.contents else ""
             
-        # Handle different tags
-        if tag == 'b' or tag == 'strong':
-            return f"**{content}**"
-        elif tag == 'i' or tag == 'em':
-            return f"*{content}*"
-        elif tag == 'u':
-            return f"_{content}_"
-        elif tag == 'strike' or tag == 's' or tag == 'del':
-            return f"~~{content}~~"
-        elif tag == 'code':
-            return f"`{content}`"
-        elif tag == 'pre':
-            return f"```\n{content}\n```"
-        elif tag == 'br':
-            return "\n"
-        elif tag == 'hr':
-            return "\n---\n"
-        elif tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-            level = int(tag[1])
-            return f"\n{'#' * level} {content}\n"
-        elif tag == 'a':
+        # Tags that just wrap their content
+        wrap = _TAG_WRAP.get(tag)
+        if wrap is not None:
+            prefix, suffix = wrap
+            return f"{prefix}{content}{suffix}"
+        
+        # Handle the remaining tags
+        if tag == 'a':
             href = ""
             for attr in tag_node.attributes:
                 if str(attr.name).lower() == 'href':
@@ -320,7 +260,7 @@ class WikivoyageParser:
             # For unknown tags, just return the content
             return content
 
-    def _convert_wikilink_to_markdown(self, wikilink_node) -> str:
+    def _convert_wikilink_to_markdown(self, wikilink_node: nodes.Wikilink) -> str:
         """Convert wikilink to markdown"""
         title = str(wikilink_node.title)
         
@@ -330,7 +270,7 @@ class WikivoyageParser:
         else:
             return f"[{title}]({title})"
 
-    def _convert_external_link_to_markdown(self, link_node) -> str:
+    def _convert_external_link_to_markdown(self, link_node: nodes.ExternalLink) -> str:
         """Convert external link to markdown"""
         url = str(link_node.url)
         
@@ -345,4 +285,9 @@ class WikivoyageParser:
         if root is None:
             root = self.root
             
-        return json.dumps(root, indent=indent)
+        # orjson's indented output matches json.dumps(indent=2), anything else goes through json.
+        # That includes indent=None, whose ", " and ": " separators orjson cannot produce
+        if indent == 2:
+            return orjson.dumps(root, option=orjson.OPT_INDENT_2).decode()
+        # like orjson, keep non-ASCII text as it is instead of escaping it
+        return json.dumps(root, indent=indent, ensure_ascii=False)
@@ -1,101 +1,155 @@
 from logging import getLogger
-import xml.sax
 import asyncio
+from concurrent.futures import Executor
+from lxml import etree
 from .parser import WikivoyageParser
 
 logger = getLogger(__name__)
 
+# number of parsed pages handed to the output handler at once
+WRITE_BATCH_SIZE = 64
+# number of pages processed at the same time when no max_concurrent is configured
+DEFAULT_WORKERS = 32
 
-class WikiDumpHandler(xml.sax.ContentHandler):
+
+# parser of the current worker process, created on first use
+_worker_parser: WikivoyageParser | None = None
+
+
+def _parse_page(text: str) -> dict:
     """
-    SAX handler that, for each <page> whose <id> is in mappings,
-    collects the <text> and schedules an async task to parse
-    and write via the user‐supplied handler(s).
+    Parse the wikitext of a single page, meant to run in a worker process.
+    The parser is reused for all pages handled by the process, parse() resets its state.
     """
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = WikivoyageParser()
+    return _worker_parser.parse(text)
 
-    def __init__(self, mappings, handlers):
-        super().__init__()
+
+class WikiDumpHandler:
+    """
+    Incremental parser for the XML dump that, for each <page> whose <id> is in mappings,
+    extracts the <text> and queues it to be parsed
+    and written via the user‐supplied handler (use a MultiHandler to write to several).
+    The XML itself is parsed by libxml2, only complete <page> elements reach Python.
+    A fixed number of workers (max_concurrent, or DEFAULT_WORKERS if that is 0) processes the pages from a bounded queue,
+    so `feed` blocks once the workers fall behind and memory stays constant regardless of the dump size.
+    If an executor (typically a ProcessPoolExecutor) is given, the CPU-bound wikitext parsing runs there
+    and only the writing happens on the event loop.
+    """
+
+    def __init__(self, mappings, handler, max_concurrent=0, executor: Executor | None = None):
         self.mappings = mappings
-        # Support a single handler or a list of handlers
-        self.handlers = handlers
-        self.tasks: list[asyncio.Task] = []
-
-        self.currentTag: str | None = None
-        self.inPage = False
-        self.inRevision = False
-        self.inText = False
-        self.currentPageId: str | None = None
-        self.currentTitle: str | None = None
-        self.currentText: list[str] = []
-
-    def startElement(self, name, attrs):
-        self.currentTag = name
-        if name == "page":
-            logger.debug("start page")
-            self.inPage = True
-            self.currentPageId = None
-            self.currentTitle = None
-            self.currentText = []
-        elif name == "revision":
-            logger.debug("start revision")
-            self.inRevision = True
-        elif name == "text" and self.inRevision:
-            logger.debug("start text")
-            self.inText = True
-
-    def endElement(self, name):
-        if name == "page":
-            logger.debug("end page")
-            pid = self.currentPageId
-            if pid and pid in self.mappings:
-                wd_id = self.mappings[pid]
-                text = "".join(self.currentText)
-                title = self.currentTitle
-                logger.debug(f"scheduled {wd_id} for handling")
-                # schedule processing
-                task = asyncio.create_task(self._process(text, wd_id, title))
-                self.tasks.append(task)
-            else:
-                logger.debug(f"page {pid} without wikidata id, skipping...")
-            # reset
-            self.inPage = self.inRevision = self.inText = False
-            self.currentPageId = None
-            self.currentTitle = None
-            self.currentText = []
-        elif name == "revision":
-            logger.debug("end revision")
-            self.inRevision = False
-        elif name == "text":
-            logger.debug("end text")
-            self.inText = False
-        self.currentTag = None
-
-    def characters(self, content):
-        # Only filter whitespace for ID fields, preserve all content for text
-        if (
-            self.currentTag == "id"
-            and self.inPage
-            and not self.inRevision
-            and not self.currentPageId
-        ):
-            content_stripped = content.strip()
-            if content_stripped:  # Only process non-empty ID content
-                self.currentPageId = content_stripped
-        elif self.currentTag == "title" and self.inPage:
-            if self.currentTitle is None:
-                self.currentTitle = content
+        self.handler = handler
+        self._executor = executor
+        # parsed pages waiting to be written as one batch
+        self._batch: list[tuple[dict, str]] = []
+        self._num_workers = max_concurrent or DEFAULT_WORKERS
+        # pages found by the XML parser, waiting to be queued
+        self._found: list[tuple[str, str, str]] = []
+        self._queue: asyncio.Queue[tuple[str, str, str] | None] = asyncio.Queue(maxsize=2 * self._num_workers)
+        # started on the first feed, when an event loop is guaranteed to run
+        self._workers: list[asyncio.Task] = []
+        self._error: BaseException | None = None
+        # parse() resets the parser state and never awaits, so a single instance can serve all pages
+        self._wiki_parser = WikivoyageParser()
+        # the namespace changes with the dump schema version, so match any
+        self._parser = etree.XMLPullParser(
+            events=("end",), tag="{*}page", huge_tree=True
+        )
+
+    async def feed(self, data: bytes):
+        """
+        Feed the next chunk of the raw (decompressed) dump and queue all pages completed by it.
+        Waits while the queue is full and raises the first error of a processed page.
+        """
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self._num_workers)]
+        self._parser.feed(data)
+        self._handle_pages()
+        await self._enqueue_found()
+
+    async def close(self):
+        """
+        Signal the end of the dump and wait until all pages are processed and written.
+        Raises the first error of a processed page.
+        """
+        self._parser.close()
+        self._handle_pages()
+        await self._enqueue_found()
+        # one sentinel per worker, queued after all pending pages
+        for _ in self._workers:
+            await self._queue.put(None)
+        await asyncio.gather(*self._workers)
+        if self._error is not None:
+            raise self._error
+        await self._flush()
+
+    async def _enqueue_found(self):
+        found, self._found = self._found, []
+        for item in found:
+            if self._error is not None:
+                break
+            await self._queue.put(item)
+        if self._error is not None:
+            raise self._error
+
+    def _handle_pages(self):
+        for _, page in self._parser.read_events():
+            pid = page.findtext("{*}id")
+            # the mappings are keyed by the numeric page id
+            wd_id = self.mappings.get(int(pid)) if pid else None
+            if wd_id is None:
+                logger.debug("page %s without wikidata id, skipping...", pid)
+            elif page.find("{*}redirect") is not None:
+                # redirects carry no content of their own, don't spend a parse on them
+                logger.debug("page %s is a redirect, skipping...", pid)
             else:
-                self.currentTitle += content
-        elif self.inText:
-            # Always append text content, even if it's just whitespace or newlines
-            self.currentText.append(content)
-
-    async def _process(self, text: str, uid: str, title: str):
-        parser = WikivoyageParser()
-        entry = parser.parse(text)
+                text = page.findtext("{*}revision/{*}text") or ""
+                title = page.findtext("{*}title")
+                logger.debug("scheduled %s for handling", wd_id)
+                # queued by the caller of feed, this runs synchronously inside the XML parsing
+                self._found.append((text, wd_id, title))
+            # free the page and the already handled siblings so the tree does not grow with the dump
+            page.clear()
+            while page.getprevious() is not None:
+                del page.getparent()[0]
+
+    async def _worker(self):
+        """
+        Processes queued pages until a sentinel (None) is received.
+        """
+        while (item := await self._queue.get()) is not None:
+            try:
+                await self._parse_and_write(*item)
+            except Exception as e:
+                # keep draining so feed never blocks on a full queue,
+                # the error is raised on the next feed or on close
+                if self._error is None:
+                    self._error = e
+
+    async def _parse_and_write(self, text: str, uid: str, title: str):
+        if self._executor is not None:
+            entry = await asyncio.get_running_loop().run_in_executor(self._executor, _parse_page, text)
+        else:
+            entry = self._wiki_parser.parse(text)
         entry["properties"]["title"] = title
 
-        # Write to all handlers concurrently
-        await asyncio.gather(
-            *[handler.write_entry(entry, uid) for handler in self.handlers],
-        )
+        self._batch.append((entry, uid))
+        if len(self._batch) >= WRITE_BATCH_SIZE:
+            await self._flush()
+
+    async def _flush(self):
+        """
+        Write the collected pages as one batch, using the handler's bulk API if it has one.
+        """
+        # take the batch before awaiting, so pages parsed in the meantime start a new one
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        write_entries = getattr(self.handler, "write_entries", None)
+        if write_entries is not None:
+            await write_entries(batch)
+        else:
+            await asyncio.gather(*[self.handler.write_entry(entry, uid) for entry, uid in batch])